@@ -3,6 +3,7 @@ import os
 import threading
 import configparser
 from flamb import Iteration
+from job_queue import SolverQueue, DEFAULT_QUEUE_PATH
 from PySide6.QtCore import Qt, QObject, Signal
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QLabel, QLineEdit, QPushButton,
@@ -79,6 +80,7 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("SOFiSTiK Processor")
         self.setGeometry(100, 100, 600, 600)
         self.sofistik_path = self.load_sofistik_path()
+        self.queue_path, self.max_concurrency = self.load_queue_settings()
         self.setup_ui()
 
         # Redirect stdout and stderr to the output_text
@@ -97,6 +99,20 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Configuration Warning", "SOFiSTiK path not found. Please set it via the Configuration dialog.")
             return ""
 
+    def load_queue_settings(self):
+        # Solver queue shared by the users of the host and its licence limit, from the [Queue] section
+        config = configparser.ConfigParser()
+        config.read('config.ini')
+        queue = config['Queue'] if 'Queue' in config else {}
+        queue_path = queue.get('queue_path') or DEFAULT_QUEUE_PATH
+        max_concurrency = None
+        if queue.get('max_concurrency'):
+            try:
+                max_concurrency = int(queue['max_concurrency'])
+            except ValueError:
+                print(f"Invalid max_concurrency '{queue['max_concurrency']}' in config.ini, value stored in the queue kept.")
+        return os.path.abspath(os.path.normpath(queue_path)), max_concurrency
+
     def setup_ui(self):
         # Central widget
         central_widget = QWidget(self)
@@ -207,7 +223,9 @@ class MainWindow(QMainWindow):
         # Perform the calculation process with Iteration from flamb
         try:
             cdb_file_path = dat_file.replace('.dat', '.cdb')
-            iteration = Iteration(V, H, epsilon, cdb_file_path, dat_file, self.sofistik_path)
+            # Solver runs of all windows on this host share the licence-aware queue
+            iteration = Iteration(V, H, epsilon, cdb_file_path, dat_file, self.sofistik_path,
+                                  solver_queue=SolverQueue(self.queue_path, max_concurrency=self.max_concurrency))
             iteration.initialize()
             iteration.loop()
             print("Process completed successfully.")
@@ -232,7 +250,9 @@ class MainWindow(QMainWindow):
             print("SOFiSTiK path updated to {}".format(self.sofistik_path))
 
     def save_sofistik_path(self, sofistik_path):
+        # Keep the other sections, e.g. [Queue]
         config = configparser.ConfigParser()
+        config.read('config.ini')
         config['SOFiSTiK'] = {'sofistik_path': sofistik_path}
         with open('config.ini', 'w') as configfile:
             config.write(configfile)
@@ -0,0 +1,573 @@
+"""
+Benchmarks of the iteration pipeline on a fake solver, runnable without SOFiSTiK.
+
+Usage:
+    python benchmark.py warm-start [--nodes N] [--grid G]
+    python benchmark.py dat-writer [--nodes N] [--cases C]
+    python benchmark.py solver-modules [--nodes N] [--time-scale S]
+    python benchmark.py pipeline [--nodes N] [--cases C] [--workers W] [--run-time T]
+    python benchmark.py coordinate-format [--nodes N] [--precision P]
+    python benchmark.py history [--nodes N] [--codec zlib|zstd]
+    python benchmark.py quad-results [--elements E]
+    python benchmark.py relaxation [--nodes N]
+    python benchmark.py connectivity [--side S]
+    python benchmark.py spatial-index [--nodes N] [--queries Q]
+"""
+import os
+import re
+import io
+import time
+import shutil
+import argparse
+import tempfile
+import contextlib
+from ctypes import c_int, sizeof
+import numpy as np
+from flamb import Iteration, FileInteraction, CDBinteract, NodeIndex, ConnectivityGraph
+from dat_template import DatTemplate, format_fixed
+from cdb_backend import MemoryBackend, CDB_OK, CDB_END_OF_KEY
+from solution_store import SolutionStore
+from history_store import IterationHistory
+from pipeline import PipelinedExecutor
+from spatial_index import NodeGrid
+from sofistik_daten import CNODE, CN_DISP, CQUAD, CQUAD_FOR, CQUAD_FOC, CBEAM, CSECT
+
+
+# Modelled cost in seconds of one run of each module; WING draws the plots added by add_code
+DEFAULT_MODULE_COSTS = {'AQUA': 0.5, 'SOFIMSHC': 1.0, 'SOFILOAD': 0.3, 'ASE': 2.0, 'WING': 4.0}
+
+
+class FakeSolver:
+    def __init__(self, backend, nodes, flexibility=0.05, coupling=0.5, run_time=0.0, module_costs=None,
+                 time_scale=0.0, model='trig'):
+        """
+        Stands in for sps.exe: reads the loads and node coordinates from the .dat file and writes
+        geometry dependent displacements for LC 2 (V) and LC 3 (H) into a MemoryBackend.
+
+        :param backend: MemoryBackend read by the iteration.
+        :param nodes: Number of nodes of the model.
+        :param flexibility: Displacement per unit load of the most flexible node.
+        :param coupling: Strength of the geometric nonlinearity.
+        :param run_time: Seconds slept per run to model the solver cost.
+        :param module_costs: Dict {module: modelled seconds} charged for every enabled PROG block.
+        :param time_scale: Fraction of the modelled module cost actually slept.
+        :param model: 'trig': displacements vary with the sine and cosine of the coordinates,
+                      'sway': the horizontal displacement grows with the horizontal offset of the node
+                      from make_model's geometry, like a P-delta effect (coupling < 0: stiffening).
+        """
+        self.backend = backend
+        self.flexibility = flexibility * np.arange(1, nodes + 1) / nodes
+        self.coupling = coupling
+        self.run_time = run_time
+        self.module_costs = module_costs
+        self.time_scale = time_scale
+        self.model = model
+        self.modelled_time = 0.0
+        self.runs = 0
+
+    def __call__(self, dat_file):
+        self.runs += 1
+        with open(dat_file, 'r') as file:
+            content = file.read()
+
+        V = float(re.search(r'NODE NO 1002 TYPE PG P1\s+(\S+)', content).group(1))
+        H = float(re.search(r'NODE NO 1002 TYPE PX P1\s+(\S+)', content).group(1))
+        coords = np.array(re.findall(
+            r'^NODE\s+\d+\s+X\s+(\S+)\s+Y\s+(\S+)\s+Z\s+(\S+)', content, re.MULTILINE), dtype=float)
+
+        # Displacements depend on the current geometry, so the iteration has a fixed point to find
+        if self.model == 'sway':
+            uz_v = -V * self.flexibility
+            ux_h = self.flexibility * (H + self.coupling * V * (coords[:, 0] - np.arange(len(coords))))
+        else:
+            uz_v = -V * self.flexibility * (1 + self.coupling * np.cos(coords[:, 0]))
+            ux_h = H * self.flexibility * (1 + self.coupling * np.sin(coords[:, 2]))
+        self.backend.set_records(24, 2, [disp_record(i + 1, 0.0, uz) for i, uz in enumerate(uz_v)])
+        self.backend.set_records(24, 3, [disp_record(i + 1, ux, 0.0) for i, ux in enumerate(ux_h)])
+
+        run_time = self.run_time
+        if self.module_costs is not None:
+            # Blocks marked -PROG are skipped by sps.exe
+            modules = re.findall(r'^(?!-)\+?PROG\s+(\w+)', content, re.MULTILINE | re.IGNORECASE)
+            cost = sum(self.module_costs.get(module.upper(), 0.0) for module in modules)
+            self.modelled_time += cost
+            run_time += cost * self.time_scale
+        if run_time:
+            time.sleep(run_time)
+
+
+def disp_record(nr, ux, uz):
+    record = CN_DISP()
+    record.m_nr = nr
+    record.m_ux = ux
+    record.m_uz = uz
+    return record
+
+
+def make_model(directory, nodes):
+    """
+    Writes a .dat file with a line of nodes and returns (dat_file, node records).
+    """
+    dat_file = os.path.join(directory, 'model.dat')
+    records = []
+    with open(dat_file, 'w') as file:
+        file.write("+PROG AQUA urs:1\nHEAD Sections\nEND\n+PROG SOFIMSHC urs:2\nHEAD Benchmark model\n")
+        for i in range(nodes):
+            file.write(f"NODE {i + 1} X {float(i)} Y 0.0 Z 0.0\n")
+            record = CNODE()
+            record.m_nr = i + 1
+            record.m_xyz[0] = float(i)
+            records.append(record)
+        # No ASE block, so Iteration appends the ASE and WING blocks of add_code
+        file.write("END\nPROG SOFILOAD urs:3\nEND\n")
+    return dat_file, records
+
+
+def run_case(template, directory, nodes, V, H, epsilon, solution_store=None, iteration_options=None,
+             records=None, **solver_options):
+    """
+    Runs one (V, H) case on a fresh copy of the model and returns the fake solver.
+
+    :param records: Additional CDB records {(kwh, kwl): records} of the model.
+    """
+    dat_file = os.path.join(directory, f"case_{V:g}_{H:g}.dat")
+    shutil.copy(template[0], dat_file)
+    backend = MemoryBackend({(20, 0): template[1], **(records or {})})
+    solver = FakeSolver(backend, nodes, **solver_options)
+    iteration = Iteration(V, H, epsilon, dat_file.replace('.dat', '.cdb'), dat_file, directory,
+                          cdb_backend=backend, solver=solver, solution_store=solution_store,
+                          **(iteration_options or {}))
+    with contextlib.redirect_stdout(io.StringIO()):
+        iteration.initialize()
+        iteration.loop()
+    return solver
+
+
+def bench_warm_start(nodes, grid, epsilon):
+    directory = tempfile.mkdtemp()
+    try:
+        template = make_model(directory, nodes)
+        cases = [(V, H) for V in np.linspace(1.0, 5.0, grid) for H in np.linspace(1.0, 5.0, grid)]
+
+        results = {}
+        for mode in ('cold', 'warm'):
+            store = SolutionStore(os.path.join(directory, 'store')) if mode == 'warm' else None
+            start = time.perf_counter()
+            runs = sum(run_case(template, directory, nodes, V, H, epsilon, store).runs for V, H in cases)
+            results[mode] = (runs, time.perf_counter() - start)
+
+        print(f"Warm start benchmark: {len(cases)} cases, {nodes} nodes, epsilon {epsilon}")
+        for mode, (runs, elapsed) in results.items():
+            print(f"  {mode}: {runs} solver runs ({runs / len(cases):.2f} per case), {elapsed:.2f} s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_dat_writer(nodes, cases):
+    directory = tempfile.mkdtemp()
+    try:
+        dat_file, _ = make_model(directory, nodes)
+        FileInteraction(dat_file).replace_sofiload()
+        rng = np.random.default_rng(0)
+        loads = rng.uniform(1.0, 5.0, (cases, 2))
+        xyz = rng.uniform(0.0, 10.0, (cases, nodes, 3))
+        nr = np.arange(1, nodes + 1)
+
+        results = {}
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(cases):
+                case_file = os.path.join(directory, f"regex_{i}.dat")
+                shutil.copy(dat_file, case_file)
+                patch = FileInteraction(case_file)
+                patch.modify('NODE NO 1002 TYPE PG P1', str(loads[i, 0]))
+                patch.modify('NODE NO 1002 TYPE PX P1', str(loads[i, 1]))
+                for node, (x, y, z) in zip(nr, xyz[i]):
+                    patch.modify_coord(str(node), str(x), str(y), str(z))
+        results['regex patching'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        template = DatTemplate.from_file(dat_file)
+        for i in range(cases):
+            template.write(os.path.join(directory, f"template_{i}.dat"),
+                           {'V': loads[i, 0], 'H': loads[i, 1]}, nr, xyz[i])
+        results['template'] = time.perf_counter() - start
+
+        with open(os.path.join(directory, "regex_0.dat")) as regex:
+            with open(os.path.join(directory, "template_0.dat")) as rendered:
+                identical = regex.read() == rendered.read()
+
+        print(f"Dat writer benchmark: {cases} cases, {nodes} nodes, identical output: {identical}")
+        for mode, elapsed in results.items():
+            print(f"  {mode}: {elapsed:.3f} s ({1000 * elapsed / cases:.2f} ms per case)")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_solver_modules(nodes, time_scale, epsilon):
+    directory = tempfile.mkdtemp()
+    try:
+        template = make_model(directory, nodes)
+        modes = {
+            'every block every run': {},
+            'defer_graphics': {'defer_graphics': True},
+            'partial_execution': {'partial_execution': True},
+        }
+        print(f"Solver module benchmark: {nodes} nodes, module costs {DEFAULT_MODULE_COSTS}")
+        for mode, options in modes.items():
+            start = time.perf_counter()
+            solver = run_case(template, directory, nodes, 3.0, 3.0, epsilon, iteration_options=options,
+                              module_costs=DEFAULT_MODULE_COSTS, time_scale=time_scale)
+            elapsed = time.perf_counter() - start
+            print(f"  {mode}: {solver.runs} runs, modelled solver time {solver.modelled_time:.1f} s "
+                  f"({solver.modelled_time / solver.runs:.2f} s per run), wall {elapsed:.2f} s")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_pipeline(nodes, cases, workers, run_time, epsilon):
+    directory = tempfile.mkdtemp()
+    try:
+        template = make_model(directory, nodes)
+
+        def factory(case):
+            V, H = case
+            dat_file = os.path.join(directory, f"pipeline_{V:g}_{H:g}.dat")
+            shutil.copy(template[0], dat_file)
+            backend = MemoryBackend({(20, 0): template[1]})
+            solver = FakeSolver(backend, nodes, run_time=run_time)
+            return Iteration(V, H, epsilon, dat_file.replace('.dat', '.cdb'), dat_file, directory,
+                             cdb_backend=backend, solver=solver)
+
+        load_cases = [(1.0 + 0.5 * i, 2.0) for i in range(cases)]
+        print(f"Pipeline benchmark: {cases} cases, {nodes} nodes, solver run {run_time} s, one solver slot")
+        for n in sorted({1, workers}):
+            executor = PipelinedExecutor(factory, workers=n, solver_slots=1)
+            with contextlib.redirect_stdout(io.StringIO()):
+                executor.run(load_cases)
+            report = executor.report
+            print(f"  {n} worker(s): wall {report['wall']:.2f} s, solver {report['solver']:.2f} s, "
+                  f"other {report['other']:.2f} s, overlap efficiency {report['overlap_efficiency']:.0%}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_coordinate_format(nodes, precision):
+    rng = np.random.default_rng(0)
+    nr = np.arange(1, nodes + 1)
+    xyz = rng.uniform(-100.0, 100.0, (nodes, 3))
+    text = ''.join(f"NODE {n} X 0.0 Y 0.0 Z 0.0\n" for n in nr)
+    results = {}
+
+    # Former path: str() of each float in the f-string of modify_coord.replacement
+    start = time.perf_counter()
+    lines = [f"NODE {node} X {str(x)} Y {str(y)} Z {str(z)}\n" for node, (x, y, z) in zip(nr, xyz)]
+    ''.join(lines)
+    results['per node str()'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    format_fixed(xyz, precision)
+    results[f'format_fixed ({precision} decimals)'] = time.perf_counter() - start
+
+    template = DatTemplate(text, precision=precision)
+    start = time.perf_counter()
+    template.update(nr=nr, xyz=xyz)
+    template.render()
+    results['DatTemplate update + render'] = time.perf_counter() - start
+
+    print(f"Coordinate format benchmark: {nodes} nodes")
+    for mode, elapsed in results.items():
+        print(f"  {mode}: {1000 * elapsed:.1f} ms")
+
+
+def bench_history(nodes, epsilon, codec):
+    directory = tempfile.mkdtemp()
+    try:
+        template = make_model(directory, nodes)
+        path = os.path.join(directory, 'history.bin')
+        history = IterationHistory(path, quantum=epsilon / 100, codec=codec)
+        start = time.perf_counter()
+        run_case(template, directory, nodes, 3.0, 3.0, epsilon, iteration_options={'history': history})
+        elapsed = time.perf_counter() - start
+
+        raw = len(history) * 2 * nodes * 3 * 8
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        for i in range(len(history) - 1, -1, -1):
+            history[i]
+        reverse = time.perf_counter() - start
+        _, largest, row = history.diff(0, len(history) - 1, 'displacement')
+
+        print(f"History benchmark: {nodes} nodes, {len(history)} passes, codec {history.codec}, "
+              f"quantum {history.quantum:g}")
+        print(f"  file {size / 1e6:.2f} MB for {raw / 1e6:.2f} MB of float64 arrays ({raw / size:.1f}x)")
+        print(f"  run with history {elapsed:.2f} s, every pass read in reverse order {reverse:.3f} s")
+        print(f"  largest displacement change from the first to the last pass: {largest:.4g} (row {row})")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_quad_results(elements):
+    rng = np.random.default_rng(0)
+    data = np.zeros(elements, dtype=np.dtype(CQUAD_FOR))
+    data['m_nr'] = np.arange(1, elements + 1)
+    data['m_mxx'] = rng.normal(size=elements)
+    data['m_sg'] = rng.normal(size=(elements, 8, 4))
+    # Maximum record first, as written by ASE
+    records = [bytes(CQUAD_FOC())] + [row.tobytes() for row in data]
+    backend = MemoryBackend({(210, 2): records})
+    results = {}
+
+    # Record by record into Python lists
+    start = time.perf_counter()
+    record = CQUAD_FOR()
+    nr, mxx, sg = [], [], []
+    ie = CDB_OK
+    while ie < CDB_END_OF_KEY:
+        ie = backend.get(210, 2, record, c_int(sizeof(record)))
+        if ie < CDB_END_OF_KEY and record.m_nr > 0:
+            nr.append(record.m_nr)
+            mxx.append(record.m_mxx)
+            sg.append([list(gauss) for gauss in record.m_sg])
+    results['record by record'] = time.perf_counter() - start
+
+    cdb = CDBinteract(backend)
+    start = time.perf_counter()
+    forces = cdb.get_quad_forces(2)
+    results['get_quad_forces'] = time.perf_counter() - start
+    identical = np.array_equal(forces['m_sg'], np.array(sg, dtype=np.float32)) and np.array_equal(forces['m_nr'], nr)
+
+    print(f"Quad results benchmark: {elements} CQUAD_FOR records, m_sg {forces['m_sg'].shape}, "
+          f"identical: {identical}")
+    for mode, elapsed in results.items():
+        print(f"  {mode}: {1000 * elapsed:.1f} ms")
+
+
+def beam_records(nodes, flexibility):
+    """
+    Returns CBEAM and CSECT records of a beam line along the nodes of make_model, each beam with
+    its own section whose bending stiffness follows the flexibility of FakeSolver.
+    """
+    records = {}
+    beams = []
+    for i in range(1, nodes):
+        beams.append(CBEAM(m_nr=i, m_np=i, m_dl=1.0))
+        beams[-1].m_node[0], beams[-1].m_node[1] = i, i + 1
+        inertia = 1.0 / (flexibility * (i + 0.5) / nodes)
+        records[(9, i)] = [CSECT(m_id=0, m_a=1.0, m_iy=inertia, m_iz=inertia, m_em=1.0)]
+    records[(100, 0)] = beams
+    return records
+
+
+def bench_relaxation(nodes, epsilon):
+    directory = tempfile.mkdtemp()
+    try:
+        template = make_model(directory, nodes)
+        cases = [('trig', 0.05, 0.5), ('trig', 0.2, 1.0), ('trig', 0.5, 1.0),
+                 ('sway', 0.1, 1.5), ('sway', 0.1, 3.0), ('sway', 0.1, -1.5), ('sway', 0.1, -3.0)]
+        print(f"Relaxation benchmark: {nodes} nodes, epsilon {epsilon}, solver runs per case")
+        for model, flexibility, coupling in cases:
+            runs = {}
+            for mode in ('plain', 'relaxation'):
+                solver = run_case(template, directory, nodes, 3.0, 3.0, epsilon,
+                                  iteration_options={'relaxation': mode == 'relaxation'},
+                                  records=beam_records(nodes, flexibility), flexibility=flexibility,
+                                  coupling=coupling, model=model)
+                runs[mode] = solver.runs
+                properties = os.path.join(directory, 'case_3_3_properties.npz')
+                if os.path.exists(properties):
+                    os.remove(properties)
+            print(f"  {model}, flexibility {flexibility}, coupling {coupling}: plain {runs['plain']}, "
+                  f"relaxation {runs['relaxation']}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bench_connectivity(side):
+    # Quad mesh of side x side nodes, supported along its first row
+    nr = np.arange(1, side * side + 1)
+    nodes = np.zeros(len(nr), dtype=np.dtype(CNODE))
+    nodes['m_nr'] = nr
+    nodes['m_kfix'] = np.where(nr <= side, 63, 0)
+    grid = nr.reshape(side, side)
+    quads = np.zeros((side - 1) ** 2, dtype=np.dtype(CQUAD))
+    quads['m_nr'] = np.arange(1, len(quads) + 1)
+    quads['m_node'] = np.column_stack([grid[:-1, :-1].ravel(), grid[:-1, 1:].ravel(),
+                                       grid[1:, 1:].ravel(), grid[1:, :-1].ravel()])
+    backend = MemoryBackend({(20, 0): [row.tobytes() for row in nodes],
+                             (200, 0): [row.tobytes() for row in quads]})
+    results = {}
+
+    # Adjacency sets and breadth-first search in Python, from the element arrays
+    start = time.perf_counter()
+    adjacency = {int(n): set() for n in nr}
+    for element in quads['m_node'].tolist():
+        for a in element:
+            adjacency[a].update(b for b in element if b != a)
+    labels, count = {}, 0
+    for n in adjacency:
+        if n in labels:
+            continue
+        labels[n], queue = count, [n]
+        while queue:
+            for m in adjacency[queue.pop()]:
+                if m not in labels:
+                    labels[m] = count
+                    queue.append(m)
+        count += 1
+    results['Python sets'] = time.perf_counter() - start
+
+    node_index = NodeIndex(nr)
+    start = time.perf_counter()
+    graph = ConnectivityGraph.from_elements(node_index, [quads['m_node']], nodes['m_kfix'] != 0)
+    graph.components()
+    results['CSR'] = time.perf_counter() - start
+
+    directory = tempfile.mkdtemp()
+    try:
+        cdb_file_path = os.path.join(directory, 'model.cdb')
+        cdb = CDBinteract(backend)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            ConnectivityGraph.read(cdb, node_index).components()
+            results['CSR with the CDB reads'] = time.perf_counter() - start
+        graph.save(cdb_file_path, 'benchmark')
+        start = time.perf_counter()
+        cached = ConnectivityGraph.load(cdb_file_path, 'benchmark')
+        cached.components()
+        results['CSR from cache'] = time.perf_counter() - start
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    start = time.perf_counter()
+    region = graph.expand(nr == side * side // 2, hops=5)
+    results['5-ring neighbourhood'] = time.perf_counter() - start
+
+    print(f"Connectivity benchmark: {len(nr)} nodes, {len(quads)} quads, {len(graph.indices) // 2} edges, "
+          f"{graph.components().max() + 1} part(s) (Python: {count}), {len(graph.unsupported_components())} "
+          f"unsupported, {np.count_nonzero(region)} nodes within 5 rings of the centre")
+    for mode, elapsed in results.items():
+        print(f"  {mode}: {1000 * elapsed:.1f} ms")
+
+
+def bench_spatial_index(nodes, queries):
+    # Curved membrane: a square grid of nodes lifted into a dome
+    rng = np.random.default_rng(0)
+    side = int(np.sqrt(nodes))
+    x, y = np.meshgrid(np.arange(side, dtype=float), np.arange(side, dtype=float), indexing='ij')
+    z = 0.1 * side * np.sin(np.pi * x / side) * np.sin(np.pi * y / side)
+    xyz = np.column_stack([x.ravel(), y.ravel(), z.ravel()])
+    nr = np.arange(1, len(xyz) + 1)
+    points = xyz[rng.integers(len(xyz), size=queries)] + rng.normal(scale=0.5, size=(queries, 3))
+    results = {}
+
+    start = time.perf_counter()
+    grid = NodeGrid(nr, xyz)
+    results['build'] = time.perf_counter() - start
+
+    # Form-finding passes: the nodes move by a fraction of a cell, then by several cells
+    for label, scale in (('update, small movement', 0.01), ('update, large movement', 1.0)):
+        moved = xyz + rng.normal(scale=scale, size=xyz.shape)
+        start = time.perf_counter()
+        changed = grid.update(moved)
+        results[f"{label} ({changed} changed cell)"] = time.perf_counter() - start
+    xyz = grid.xyz.copy()
+
+    start = time.perf_counter()
+    found = [grid.nearest(point)[0] for point in points]
+    results['nearest, per query'] = (time.perf_counter() - start) / queries
+    start = time.perf_counter()
+    brute = [nr[np.argmin(np.einsum('ij,ij->i', xyz - point, xyz - point))] for point in points[:20]]
+    results['nearest by brute force, per query'] = (time.perf_counter() - start) / 20
+    identical = found[:20] == [int(n) for n in brute]
+
+    boxes = points - 2.0, points + 2.0
+    start = time.perf_counter()
+    counts = [len(grid.box(lower, upper)) for lower, upper in zip(*boxes)]
+    results['box of 4 x 4 x 4, per query'] = (time.perf_counter() - start) / queries
+    start = time.perf_counter()
+    for lower, upper in zip(boxes[0][:20], boxes[1][:20]):
+        nr[np.all((xyz >= lower) & (xyz <= upper), axis=1)]
+    results['box by brute force, per query'] = (time.perf_counter() - start) / 20
+
+    print(f"Spatial index benchmark: {len(xyz)} nodes, grid {grid.shape.tolist()}, {queries} queries, "
+          f"{np.mean(counts):.1f} nodes per box, nearest identical to brute force: {identical}")
+    for mode, elapsed in results.items():
+        unit, factor = ('us', 1e6) if 'per query' in mode else ('ms', 1e3)
+        print(f"  {mode}: {factor * elapsed:.1f} {unit}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+
+    warm = subparsers.add_parser('warm-start', help="solver runs per case with and without SolutionStore")
+    warm.add_argument('--nodes', type=int, default=50)
+    warm.add_argument('--grid', type=int, default=5)
+    warm.add_argument('--epsilon', type=float, default=1e-6)
+
+    writer = subparsers.add_parser('dat-writer', help="regex patching against DatTemplate rendering")
+    writer.add_argument('--nodes', type=int, default=500)
+    writer.add_argument('--cases', type=int, default=5)
+
+    modules = subparsers.add_parser('solver-modules', help="modelled solver time with deferred graphics "
+                                                           "and partial execution")
+    modules.add_argument('--nodes', type=int, default=50)
+    modules.add_argument('--time-scale', type=float, default=0.0, help="fraction of the modelled cost slept")
+    modules.add_argument('--epsilon', type=float, default=1e-6)
+
+    pipeline = subparsers.add_parser('pipeline', help="cases overlapped by PipelinedExecutor")
+    pipeline.add_argument('--nodes', type=int, default=2000)
+    pipeline.add_argument('--cases', type=int, default=6)
+    pipeline.add_argument('--workers', type=int, default=2)
+    pipeline.add_argument('--run-time', type=float, default=0.05, help="seconds per fake solver run")
+    pipeline.add_argument('--epsilon', type=float, default=1e-6)
+
+    coordinates = subparsers.add_parser('coordinate-format', help="per-node str() against format_fixed")
+    coordinates.add_argument('--nodes', type=int, default=100000)
+    coordinates.add_argument('--precision', type=int, default=8)
+
+    history = subparsers.add_parser('history', help="size and access time of IterationHistory")
+    history.add_argument('--nodes', type=int, default=20000)
+    history.add_argument('--epsilon', type=float, default=1e-6)
+    history.add_argument('--codec', choices=('zlib', 'zstd'), default=None)
+
+    quads = subparsers.add_parser('quad-results', help="record by record against bulk CQUAD_FOR reading")
+    quads.add_argument('--elements', type=int, default=50000)
+
+    relaxation = subparsers.add_parser('relaxation', help="solver runs with and without RelaxationPolicy")
+    relaxation.add_argument('--nodes', type=int, default=50)
+    relaxation.add_argument('--epsilon', type=float, default=1e-6)
+
+    connectivity = subparsers.add_parser('connectivity', help="ConnectivityGraph against Python adjacency sets")
+    connectivity.add_argument('--side', type=int, default=300)
+
+    spatial = subparsers.add_parser('spatial-index', help="NodeGrid queries against brute force")
+    spatial.add_argument('--nodes', type=int, default=1000000)
+    spatial.add_argument('--queries', type=int, default=1000)
+
+    args = parser.parse_args()
+    if args.benchmark == 'warm-start':
+        bench_warm_start(args.nodes, args.grid, args.epsilon)
+    elif args.benchmark == 'dat-writer':
+        bench_dat_writer(args.nodes, args.cases)
+    elif args.benchmark == 'solver-modules':
+        bench_solver_modules(args.nodes, args.time_scale, args.epsilon)
+    elif args.benchmark == 'pipeline':
+        bench_pipeline(args.nodes, args.cases, args.workers, args.run_time, args.epsilon)
+    elif args.benchmark == 'coordinate-format':
+        bench_coordinate_format(args.nodes, args.precision)
+    elif args.benchmark == 'history':
+        bench_history(args.nodes, args.epsilon, args.codec)
+    elif args.benchmark == 'quad-results':
+        bench_quad_results(args.elements)
+    elif args.benchmark == 'relaxation':
+        bench_relaxation(args.nodes, args.epsilon)
+    elif args.benchmark == 'connectivity':
+        bench_connectivity(args.side)
+    elif args.benchmark == 'spatial-index':
+        bench_spatial_index(args.nodes, args.queries)
+
+
+if __name__ == "__main__":
+    main()
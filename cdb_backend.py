@@ -0,0 +1,382 @@
+import sys
+import os
+import mmap
+import struct
+import threading
+from ctypes import *
+
+
+# Return codes of sof_cdb_get, mirrored by every backend
+CDB_OK = 0
+CDB_TRUNCATED = 1
+CDB_END_OF_KEY = 2
+CDB_NO_KEY = 3
+
+# Return codes of sof_cdb_kexist
+KEY_MISSING = 0
+KEY_EMPTY = 1
+KEY_WITH_DATA = 2
+
+# Layout of a recorded snapshot file:
+#   header  : magic, number of keys, reserved
+#   index   : one entry per key (kwh, kwl, record count, reserved, data offset)
+#   payload : per key, the record lengths (uint32) followed by the raw records
+SNAPSHOT_MAGIC = b'SOFCDBR1'
+SNAPSHOT_HEADER = struct.Struct('<8sII')
+SNAPSHOT_ENTRY = struct.Struct('<iiIIQ')
+
+# Size of the scratch buffer used when the record type of a key is unknown
+MAX_RECORD_SIZE = 65536
+
+# The CDB DLL is loaded once per process and is not documented as thread-safe: calls of all
+# DLLBackend instances (e.g. cases of a PipelinedExecutor) go through this lock
+DLL_LOCK = threading.RLock()
+# Indices of the CDBs open through DLLBackend instances
+DLL_SESSIONS = set()
+
+
+class CDBBackend:
+    """
+    Interface of a CDB data source. Mirrors the subset of the sof_cdb_* API used by CDBinteract.
+    """
+
+    def open(self, cdb_file_path, cdb_index=99):
+        """
+        Opens the CDB and returns its index.
+
+        :param cdb_file_path: Path to the CDB file.
+        :param cdb_index: CDB index (default: 99).
+        """
+        raise NotImplementedError
+
+    def status(self):
+        """
+        Returns the CDB status (0 when closed).
+        """
+        raise NotImplementedError
+
+    def get(self, kwh, kwl, record, rec_len, pos=1):
+        """
+        Reads the next record of the key (kwh, kwl) into a ctypes structure, like sof_cdb_get.
+
+        :param kwh: Primary key.
+        :param kwl: Secondary key (load case, number...).
+        :param record: ctypes structure or buffer receiving the data.
+        :param rec_len: c_int holding the buffer size, overwritten with the record length.
+        :param pos: Read mode, 1 reads sequentially.
+        :return: 0 ok, 1 record truncated, 2 end of key reached, 3 key does not exist.
+        """
+        raise NotImplementedError
+
+    def get_records(self, kwh, kwl):
+        """
+        Returns all records stored under the key (kwh, kwl) as a list of bytes-like objects.
+
+        :param kwh: Primary key.
+        :param kwl: Secondary key.
+        """
+        buffer = create_string_buffer(MAX_RECORD_SIZE)
+        records = []
+        while True:
+            rec_len = c_int(MAX_RECORD_SIZE)
+            ie = self.get(kwh, kwl, buffer, rec_len)
+            if ie > CDB_TRUNCATED:
+                break
+            records.append(string_at(buffer, min(rec_len.value, MAX_RECORD_SIZE)))
+        return records
+
+    def key_exists(self, kwh, kwl):
+        """
+        Returns the state of a key like sof_cdb_kexist: 0 missing, 1 without data, 2 holding data.
+        """
+        lengths = self.record_lengths(kwh, kwl)
+        if lengths is None:
+            return KEY_MISSING
+        return KEY_WITH_DATA if lengths else KEY_EMPTY
+
+    def record_lengths(self, kwh, kwl):
+        """
+        Returns the length in bytes of every record of a key, None if the key does not exist.
+        One pass through the key into a scratch buffer, nothing is copied out.
+        """
+        buffer = create_string_buffer(MAX_RECORD_SIZE)
+        rec_len = c_int()
+        lengths = []
+        while True:
+            rec_len.value = MAX_RECORD_SIZE
+            ie = self.get(kwh, kwl, buffer, rec_len)
+            if ie == CDB_NO_KEY:
+                return None
+            if ie > CDB_TRUNCATED:
+                return lengths
+            lengths.append(rec_len.value)
+
+    def read_arena(self, kwh, kwl, lengths):
+        """
+        Reads the records of a key back to back into one buffer, each at its own length.
+
+        :param lengths: Record lengths returned by record_lengths.
+        :return: Bytes-like object of sum(lengths) bytes.
+        """
+        arena = (c_char * max(sum(lengths), 1))()
+        rec_len = c_int()
+        offset = 0
+        for length in lengths:
+            rec_len.value = length
+            self.get(kwh, kwl, (c_char * length).from_buffer(arena, offset), rec_len)
+            offset += length
+        # Read up to the end of the key, so the next read starts from its first record again
+        rec_len.value = 0
+        self.get(kwh, kwl, (c_char * 0)(), rec_len)
+        return memoryview(arena).cast('B')[:offset]
+
+    def close(self):
+        """
+        Closes the CDB.
+        """
+        raise NotImplementedError
+
+
+class DLLBackend(CDBBackend):
+    def __init__(self, dll_path=None):
+        """
+        Loads the CDB DLL, by default the one bundled with the application.
+
+        :param dll_path: Optional path to sof_cdb_w-2024.dll.
+        """
+        if dll_path is None:
+            # Determine the base path
+            if getattr(sys, 'frozen', False):
+                # If the application is frozen, use sys._MEIPASS
+                base_path = sys._MEIPASS
+            else:
+                # If not frozen, use the directory of the current file
+                base_path = os.path.dirname(os.path.abspath(__file__))
+
+            # Path to the DLL in the 'DLL' folder
+            dll_path = os.path.join(base_path, 'DLL', 'sof_cdb_w-2024.dll')
+
+        # Normalize and make the DLL path absolute
+        self.dll_path = os.path.abspath(os.path.normpath(dll_path))
+        dll_dir = os.path.dirname(self.dll_path)
+
+        # Always set the PATH environment variable to include the DLL directory
+        os.environ['PATH'] = dll_dir + os.pathsep + os.environ.get('PATH', '')
+
+        try:
+            print(f"Attempting to load DLL from '{self.dll_path}'")
+            print(f"Current PATH: {os.environ['PATH']}")
+            self.myDLL = cdll.LoadLibrary(self.dll_path)
+            print("DLL loaded successfully.")
+        except Exception as e:
+            print(f"Failed to load DLL '{self.dll_path}': {e}")
+            raise e
+
+        self.Index = None
+
+    def open(self, cdb_file_path, cdb_index=99):
+        # Every session gets its own index from sof_cdb_init, so sessions of other threads stay open
+        self.Index = c_int()
+        with DLL_LOCK:
+            self.Index.value = self.myDLL.sof_cdb_init(cdb_file_path.encode('utf8'), cdb_index)
+            DLL_SESSIONS.add(self.Index.value)
+        return self.Index.value
+
+    def status(self):
+        with DLL_LOCK:
+            return self.myDLL.sof_cdb_status(self.Index.value)
+
+    def get(self, kwh, kwl, record, rec_len, pos=1):
+        with DLL_LOCK:
+            return self.myDLL.sof_cdb_get(self.Index, kwh, kwl, byref(record), byref(rec_len), pos)
+
+    def key_exists(self, kwh, kwl):
+        with DLL_LOCK:
+            if len(DLL_SESSIONS) <= 1:
+                return self.myDLL.sof_cdb_kexist(kwh, kwl)
+        # sof_cdb_kexist has no index argument: with several CDBs open, scan this one's key instead
+        return super().key_exists(kwh, kwl)
+
+    def close(self):
+        # Close this session only: sof_cdb_close(0) would close the CDBs of every thread
+        with DLL_LOCK:
+            self.myDLL.sof_cdb_close(self.Index.value)
+            DLL_SESSIONS.discard(self.Index.value)
+
+
+class MemoryBackend(CDBBackend):
+    def __init__(self, records=None):
+        """
+        CDB held entirely in memory, used for tests and for replaying recorded runs.
+
+        :param records: Dict mapping (kwh, kwl) to a list of raw records (bytes or ctypes structures).
+        """
+        self.records = {}
+        self.cursors = {}
+        self.cdb_file_path = None
+        self.is_open = False
+        for key, key_records in (records or {}).items():
+            self.set_records(key[0], key[1], key_records)
+
+    def set_records(self, kwh, kwl, records):
+        """
+        Replaces all records stored under a key.
+
+        :param kwh: Primary key.
+        :param kwl: Secondary key.
+        :param records: List of bytes-like objects or ctypes structures.
+        """
+        self.records[(kwh, kwl)] = [bytes(record) for record in records]
+        self.cursors.pop((kwh, kwl), None)
+
+    def open(self, cdb_file_path, cdb_index=99):
+        self.cdb_file_path = cdb_file_path
+        self.cursors = {}
+        self.is_open = True
+        return cdb_index
+
+    def status(self):
+        return 1 if self.is_open else 0
+
+    def get(self, kwh, kwl, record, rec_len, pos=1):
+        key_records = self.records.get((kwh, kwl))
+        if key_records is None:
+            return CDB_NO_KEY
+
+        cursor = self.cursors.get((kwh, kwl), 0)
+        if cursor >= len(key_records):
+            # Like the DLL, rewind the key once its end has been reported
+            self.cursors[(kwh, kwl)] = 0
+            return CDB_END_OF_KEY
+
+        data = key_records[cursor]
+        self.cursors[(kwh, kwl)] = cursor + 1
+        size = min(len(data), rec_len.value, sizeof(record))
+        memmove(addressof(record), bytes(data[:size]), size)
+        rec_len.value = len(data)
+        return CDB_TRUNCATED if len(data) > size else CDB_OK
+
+    def get_records(self, kwh, kwl):
+        return list(self.records.get((kwh, kwl), []))
+
+    def key_exists(self, kwh, kwl):
+        if (kwh, kwl) not in self.records:
+            return KEY_MISSING
+        return KEY_WITH_DATA if self.records[(kwh, kwl)] else KEY_EMPTY
+
+    def read_arena(self, kwh, kwl, lengths):
+        return b''.join(self.records.get((kwh, kwl), []))
+
+    def record_lengths(self, kwh, kwl):
+        key_records = self.records.get((kwh, kwl))
+        return None if key_records is None else [len(record) for record in key_records]
+
+    def close(self):
+        self.is_open = False
+        self.cursors = {}
+
+
+class RecordedBackend(MemoryBackend):
+    def __init__(self, snapshot_path):
+        """
+        Replays a snapshot written by write_snapshot. The file is memory-mapped while the CDB is
+        open, so records are only paged in when they are read, and unmapped by close, which
+        releases the file (on Windows a mapped file cannot be replaced or deleted).
+
+        :param snapshot_path: Path to the snapshot file.
+        """
+        super().__init__()
+        self.snapshot_path = os.path.abspath(os.path.normpath(snapshot_path))
+        self.mm = None
+        self.map()
+
+    def map(self):
+        """
+        Maps the snapshot file and indexes its records.
+        """
+        with open(self.snapshot_path, 'rb') as file:
+            self.mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self.mm)
+        magic, n_keys, _ = SNAPSHOT_HEADER.unpack_from(self.mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            self.unmap()
+            raise ValueError(f"'{self.snapshot_path}' is not a CDB snapshot.")
+
+        for i in range(n_keys):
+            kwh, kwl, count, _, offset = SNAPSHOT_ENTRY.unpack_from(
+                self.mm, SNAPSHOT_HEADER.size + i * SNAPSHOT_ENTRY.size)
+            lengths = struct.unpack_from(f'<{count}I', self.mm, offset)
+            start = offset + 4 * count
+            key_records = []
+            for length in lengths:
+                # memoryview slices reference the mapping without copying
+                key_records.append(view[start:start + length])
+                start += length
+            self.records[(kwh, kwl)] = key_records
+
+    def unmap(self):
+        """
+        Drops the records and closes the mapping. Records still referenced elsewhere (e.g. lists
+        returned by get_records) keep the mapping alive until they are released.
+        """
+        self.records = {}
+        self.cursors = {}
+        if self.mm is None:
+            return
+        try:
+            self.mm.close()
+        except BufferError:
+            print(f"Snapshot '{self.snapshot_path}' still in use, unmapped once its records are released.")
+        self.mm = None
+
+    def open(self, cdb_file_path, cdb_index=99):
+        if self.mm is None:
+            self.map()
+        return super().open(cdb_file_path, cdb_index)
+
+    def close(self):
+        super().close()
+        self.unmap()
+
+
+def write_snapshot(snapshot_path, records):
+    """
+    Writes CDB records to a snapshot file readable by RecordedBackend.
+
+    :param snapshot_path: Path of the snapshot file to create.
+    :param records: Dict mapping (kwh, kwl) to a list of raw records.
+    """
+    keys = sorted(records)
+    offset = SNAPSHOT_HEADER.size + len(keys) * SNAPSHOT_ENTRY.size
+    entries = []
+    payloads = []
+    for kwh, kwl in keys:
+        key_records = [bytes(record) for record in records[(kwh, kwl)]]
+        payload = struct.pack(f'<{len(key_records)}I', *[len(r) for r in key_records]) + b''.join(key_records)
+        entries.append(SNAPSHOT_ENTRY.pack(kwh, kwl, len(key_records), 0, offset))
+        payloads.append(payload)
+        offset += len(payload)
+
+    with open(snapshot_path, 'wb') as file:
+        file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(keys), 0))
+        file.writelines(entries)
+        file.writelines(payloads)
+    print(f"CDB snapshot with {len(keys)} keys written to '{snapshot_path}'.")
+
+
+def capture_snapshot(backend, cdb_file_path, keys, snapshot_path):
+    """
+    Reads the given keys from a live CDB and stores them as a snapshot.
+
+    :param backend: Backend used to read the CDB, usually a DLLBackend.
+    :param cdb_file_path: Path to the CDB file.
+    :param keys: Iterable of (kwh, kwl) keys to capture, e.g. [(20, 0), (24, 2), (24, 3)].
+    :param snapshot_path: Path of the snapshot file to create.
+    """
+    backend.open(cdb_file_path)
+    try:
+        records = {(kwh, kwl): backend.get_records(kwh, kwl) for kwh, kwl in keys}
+    finally:
+        backend.close()
+    write_snapshot(snapshot_path, {key: value for key, value in records.items() if value})
@@ -0,0 +1,251 @@
+import re
+import numpy as np
+
+
+# Named parameter slots: regex whose first group is the value replaced on rendering.
+# Like FileInteraction.modify, only the first matching line of each slot is used.
+DEFAULT_SLOTS = {
+    'V': r'^\s*NODE NO 1002 TYPE PG P1\s+([-+]?\d*\.?\d+)',
+    'H': r'^\s*NODE NO 1002 TYPE PX P1\s+([-+]?\d*\.?\d+)',
+    'LC2': r"^\s*LC\s+2\s+'[^']*'\s+([-+]?\d*\.?\d+)",
+    'LC3': r"^\s*LC\s+3\s+'[^']*'\s+([-+]?\d*\.?\d+)",
+}
+
+# Program block header: marker (+ run, - skip, none run), module name
+PROG_PATTERN = re.compile(r'^([+-]?)(PROG\s+(\w+).*)$', re.IGNORECASE | re.DOTALL)
+
+# Modules only producing graphical output, no results needed by the iteration
+GRAPHICS_MODULES = {'WING', 'GRAF', 'RESULTS'}
+
+# Node coordinate line, same layout as FileInteraction.modify_coord
+NODE_PATTERN = re.compile(r'^(NODE\s+)(\d+)(\s+X\s+)(\S+)(\s+Y\s+)(\S+)(\s+Z\s+)(\S+)(.*)$', re.IGNORECASE | re.DOTALL)
+
+
+class DatTemplate:
+    def __init__(self, text, slots=None, precision=None):
+        """
+        Precompiled .dat file: the text is split once into static pieces and slots (named
+        parameters and node coordinates), so new inputs are produced by filling the slots and
+        joining the pieces, without searching the file again.
+
+        :param text: Content of the .dat file.
+        :param slots: Dict of named slots {name: regex with one group} (default: DEFAULT_SLOTS).
+        :param precision: Decimals written for coordinates (None: Python's shortest repr).
+        """
+        self.precision = precision
+        slots = {name: re.compile(pattern, re.IGNORECASE) for name, pattern in (slots or DEFAULT_SLOTS).items()}
+        self.parts = []
+        self.slot_parts = {}
+        self.values = {}
+        # Program blocks: module name, part index of the +/- marker, original marker, holds coordinates
+        self.blocks = []
+        self.disabled = set()
+        nodes = []
+        coord_parts = []
+
+        for line in text.splitlines(keepends=True):
+            match = PROG_PATTERN.match(line)
+            if match:
+                self.blocks.append({'module': match.group(3).upper(), 'part': len(self.parts),
+                                    'marker': match.group(1), 'coordinates': False})
+                self.parts.extend([match.group(1), match.group(2)])
+                continue
+
+            match = NODE_PATTERN.match(line)
+            if match:
+                start = len(self.parts)
+                self.parts.extend(match.groups())
+                nodes.append(int(match.group(2)))
+                coord_parts.append((start + 3, start + 5, start + 7))
+                if self.blocks:
+                    self.blocks[-1]['coordinates'] = True
+                continue
+
+            for name, pattern in slots.items():
+                if name in self.slot_parts:
+                    continue
+                match = pattern.match(line)
+                if match:
+                    self.parts.extend([line[:match.start(1)], match.group(1), line[match.end(1):]])
+                    self.slot_parts[name] = len(self.parts) - 2
+                    self.values[name] = match.group(1)
+                    break
+            else:
+                self.parts.append(line)
+
+        # Node number and coordinate part indices of every coordinate line, in file order
+        self.nodes = np.array(nodes, dtype=np.int64)
+        self.coord_parts = np.array(coord_parts, dtype=np.int64).reshape(-1, 3)
+        # Current coordinate texts (object array), copied into the parts on rendering
+        self.coords = np.array([self.parts[i] for i in self.coord_parts.ravel()], dtype=object).reshape(-1, 3)
+
+    @classmethod
+    def from_file(cls, file_path, slots=None, precision=None):
+        with open(file_path, 'r') as file:
+            return cls(file.read(), slots, precision)
+
+    def format_coordinates(self, xyz):
+        """
+        Formats coordinates (any shape) to a flat list of texts, with format_fixed when a
+        precision is set.
+        """
+        if self.precision is None:
+            return [str(value) for value in np.asarray(xyz, dtype=np.float64).ravel().tolist()]
+        return format_fixed(xyz, self.precision)
+
+    def coordinates(self):
+        """
+        Returns the node numbers and coordinates (float64, NaN where not numeric) of the coordinate
+        lines as written in the file.
+        """
+        def number(text):
+            try:
+                return float(text)
+            except ValueError:
+                return np.nan
+
+        xyz = np.array([number(value) for value in self.coords.ravel()], dtype=np.float64)
+        return self.nodes, xyz.reshape(-1, 3)
+
+    def coordinate_rows(self, nr):
+        """
+        Returns, for every coordinate line, the row of its node in nr (-1 if absent).
+        """
+        nr = np.asarray(nr, dtype=np.int64)
+        if len(nr) == 0:
+            return np.full(len(self.nodes), -1, dtype=np.int64)
+        sorter = np.argsort(nr, kind='stable')
+        pos = np.minimum(np.searchsorted(nr, self.nodes, sorter=sorter), len(nr) - 1)
+        rows = sorter[pos]
+        return np.where(nr[rows] == self.nodes, rows, -1)
+
+    def coordinate_dependent_blocks(self):
+        """
+        Returns the indices of the blocks to rerun after a coordinate change: the first block
+        holding node coordinates and every later block except graphical output. Earlier blocks
+        (materials, sections...) keep their results in the CDB. Without coordinate lines all blocks
+        are returned.
+        """
+        first = next((i for i, block in enumerate(self.blocks) if block['coordinates']), 0)
+        return [i for i, block in enumerate(self.blocks)
+                if i >= first and block['module'] not in GRAPHICS_MODULES]
+
+    def graphics_blocks(self):
+        """
+        Returns the indices of the graphical output blocks.
+        """
+        return [i for i, block in enumerate(self.blocks) if block['module'] in GRAPHICS_MODULES]
+
+    def non_graphics_blocks(self):
+        """
+        Returns the indices of the blocks that are not graphical output.
+        """
+        return [i for i, block in enumerate(self.blocks) if block['module'] not in GRAPHICS_MODULES]
+
+    def run_only(self, blocks=None):
+        """
+        Disables every block not in blocks (with a -PROG marker) in the next renders.
+
+        :param blocks: Indices into self.blocks, None to restore the original markers.
+        """
+        if blocks is None:
+            self.disabled = set()
+        else:
+            self.disabled = set(range(len(self.blocks))) - set(blocks)
+
+    def update(self, values=None, nr=None, xyz=None):
+        """
+        Stores new slot values and/or node coordinates used by the next renders.
+
+        :param values: Dict {slot name: value}.
+        :param nr: Node numbers of the rows of xyz.
+        :param xyz: Coordinates (n x 3). Coordinate lines of nodes not in nr are left unchanged.
+        """
+        for name, value in (values or {}).items():
+            if name not in self.slot_parts:
+                raise KeyError(f"No slot '{name}' in the template.")
+            self.values[name] = str(value)
+
+        if xyz is not None:
+            rows = self.coordinate_rows(nr)
+            lines = np.flatnonzero(rows >= 0)
+            texts = self.format_coordinates(np.asarray(xyz)[rows[lines]])
+            self.coords[lines] = np.array(texts, dtype=object).reshape(-1, 3)
+
+    def render(self, values=None, nr=None, xyz=None):
+        """
+        Returns the .dat text with the stored values, overridden by the given ones.
+        """
+        parts = np.array(self.parts, dtype=object)
+        for name, value in self.values.items():
+            parts[self.slot_parts[name]] = value
+        for name, value in (values or {}).items():
+            parts[self.slot_parts[name]] = str(value)
+
+        for i in self.disabled:
+            parts[self.blocks[i]['part']] = '-'
+
+        parts[self.coord_parts] = self.coords
+        if xyz is not None:
+            rows = self.coordinate_rows(nr)
+            lines = np.flatnonzero(rows >= 0)
+            texts = self.format_coordinates(np.asarray(xyz)[rows[lines]])
+            parts[self.coord_parts[lines]] = np.array(texts, dtype=object).reshape(-1, 3)
+        return ''.join(parts.tolist())
+
+    def write(self, file_path, values=None, nr=None, xyz=None):
+        """
+        Renders the template to a file.
+        """
+        with open(file_path, 'w') as file:
+            file.write(self.render(values, nr, xyz))
+
+
+def format_fixed(values, precision):
+    """
+    Formats numbers with a fixed number of decimals, like f"{value:.{precision}f}" but for all
+    values at once: the digits are written column by column into a preallocated byte buffer of
+    right-aligned fields, which is then split into texts. Negative zero is written without sign,
+    and the last digit may differ from Python's when value * 10**precision has more digits than
+    float64 resolves.
+
+    :param values: Array of numbers (any shape, flattened).
+    :param precision: Number of decimals.
+    :return: List of texts.
+    """
+    values = np.asarray(values, dtype=np.float64).ravel()
+    if len(values) == 0:
+        return []
+    scaled = np.round(values * 10.0 ** precision)
+    if not np.all(np.abs(scaled) < 1e17):
+        # Beyond int64 accuracy (or not finite): format one by one
+        return [f"{value:.{precision}f}" for value in values.tolist()]
+
+    magnitude = np.abs(scaled).astype(np.int64)
+    n_digits = max(precision + 1, len(str(int(magnitude.max()))))
+    point = 1 if precision else 0
+    # Field: sign, digits, decimal point, separator
+    width = 1 + n_digits + point + 1
+    buffer = np.full((len(values), width), ord(' '), dtype=np.uint8)
+
+    remaining = magnitude.copy()
+    length = np.full(len(values), precision + 1)
+    column = width - 2
+    for k in range(n_digits):
+        if precision and k == precision:
+            buffer[:, column] = ord('.')
+            column -= 1
+        digit = remaining % 10
+        remaining //= 10
+        if k > precision:
+            # Digits left of the units are shown only up to the leading one
+            shown = magnitude >= 10 ** k
+            length[shown] = k + 1
+            buffer[:, column] = np.where(shown, digit + ord('0'), ord(' '))
+        else:
+            buffer[:, column] = digit + ord('0')
+        column -= 1
+
+    negative = np.flatnonzero(scaled < 0)
+    buffer[negative, width - 2 - point - length[negative]] = ord('-')
+    return buffer.tobytes().decode('ascii').split()
@@ -1,10 +1,14 @@
-import sys
 import os
 from ctypes import *
 import numpy as np
 import re
+import time
 import subprocess
 from sofistik_daten import *
+from cdb_backend import *
+from solution_store import SolutionStore
+from dat_template import DatTemplate
+from spatial_index import NodeGrid
 
 
 class FileInteraction:
@@ -278,39 +282,20 @@ END
             outfile.writelines(output_lines)
 
 class CDBinteract:
-    def __init__(self):
-        """
-        Initializes the CDB manager with the DLL library bundled with the application.
+    def __init__(self, backend=None, metadata=None):
         """
-        # Determine the base path
-        if getattr(sys, 'frozen', False):
-            # If the application is frozen, use sys._MEIPASS
-            base_path = sys._MEIPASS
-        else:
-            # If not frozen, use the directory of the current file
-            base_path = os.path.dirname(os.path.abspath(__file__))
-
-        # Path to the DLL in the 'DLL' folder
-        dll_path = os.path.join(base_path, 'DLL', 'sof_cdb_w-2024.dll')
-
-        # Normalize and make the DLL path absolute
-        self.dll_path = os.path.abspath(os.path.normpath(dll_path))
-        dll_dir = os.path.dirname(self.dll_path)
-
-        # Always set the PATH environment variable to include the DLL directory
-        os.environ['PATH'] = dll_dir + os.pathsep + os.environ.get('PATH', '')
-
-        try:
-            print(f"Attempting to load DLL from '{self.dll_path}'")
-            print(f"Current PATH: {os.environ['PATH']}")
-            self.myDLL = cdll.LoadLibrary(self.dll_path)
-            print("DLL loaded successfully.")
-        except Exception as e:
-            print(f"Failed to load DLL '{self.dll_path}': {e}")
-            raise e
+        Initializes the CDB manager.
 
+        :param backend: CDBBackend used to access the data (default: DLLBackend with the bundled DLL).
+        :param metadata: Dict returned by read_metadata in an earlier session on the same model.
+        """
+        self.backend = backend if backend is not None else DLLBackend()
         self.cdbStat = None
         self.Index = None
+        self.metadata = metadata
+        # Key states and record lengths queried during the open session
+        self.key_states = {}
+        self.key_lengths = {}
 
     def open_cdb(self, cdb_file_path, cdb_index=99):
         """
@@ -319,10 +304,12 @@ class CDBinteract:
         :param cdb_file_path: Path to the CDB file.
         :param cdb_index: CDB index (default: 99).
         """
+        self.key_states = {}
+        self.key_lengths = {}
         self.Index = c_int()
-        self.Index.value = self.myDLL.sof_cdb_init(cdb_file_path.encode('utf8'), cdb_index)
+        self.Index.value = self.backend.open(cdb_file_path, cdb_index)
         self.cdbStat = c_int()
-        self.cdbStat.value = self.myDLL.sof_cdb_status(self.Index.value)
+        self.cdbStat.value = self.backend.status()
         if self.cdbStat.value != 0:
             print("CDB opened successfully, CDB Status =", self.cdbStat.value)
         else:
@@ -332,8 +319,8 @@ class CDBinteract:
         """
         Closes the CDB.
         """
-        self.myDLL.sof_cdb_close(0)
-        self.cdbStat.value = self.myDLL.sof_cdb_status(self.Index.value)
+        self.backend.close()
+        self.cdbStat.value = self.backend.status()
         if self.cdbStat.value == 0:
             print("CDB closed successfully, CDB Status = 0")
         else:
@@ -341,72 +328,351 @@ class CDBinteract:
 
     def get_u(self):
         """
-        Get the displacement data from the CDB.
+        Get the displacement data from the CDB: the displacements of LC 2 and 3, summed record by
+        record. With metadata, only the existing load cases are read, each into a buffer sized by
+        the record count of the key found in the first session, and the CN_DISPC maximum records
+        heading the key (the records beyond one per node) are dropped.
         """
-        ie = c_int(0)
-        RecLen = c_int(sizeof(cn_disp))
-    
-        nr_u = []
-        ux1, ux2 = [], []
-        uy1, uy2 = [], []
-        uz1, uz2 = [], []
-        
-        while ie.value < 2:
-            if ie.value >= 1:
-                break
-            ie.value = self.myDLL.sof_cdb_get(self.Index, 24, 2, byref(cn_disp), byref(RecLen), 1)
-            nr_u.append(cn_disp.m_nr)
-            ux1.append(cn_disp.m_ux)
-            uy1.append(cn_disp.m_uy)
-            uz1.append(cn_disp.m_uz)
-
-            ie.value = self.myDLL.sof_cdb_get(self.Index, 24, 3, byref(cn_disp), byref(RecLen), 1)
-            ux2.append(cn_disp.m_ux)
-            uy2.append(cn_disp.m_uy)
-            uz2.append(cn_disp.m_uz)
-
-            RecLen = c_int(sizeof(cn_disp))
-            
-        ux = np.array(ux1) + np.array(ux2)
-        uy = np.array(uy1) + np.array(uy2)
-        uz = np.array(uz1) + np.array(uz2)
-        
-
-        if nr_u:
-            max_displacement = max(ux)
-            print(f"Max displacement: {max_displacement}")
-            return nr_u, ux, uy, uz
+        if self.metadata is not None and self.metadata['load_cases']:
+            records = self.metadata['displacement_records']
+            nodes = self.metadata['nodes']
+            results = [self.read_into(24, lc, CN_DISP, records[lc])[max(records[lc] - nodes, 0) if nodes else 0:]
+                       for lc in (2, 3) if lc in self.metadata['load_cases']]
         else:
+            results = [self.read_records(24, lc, CN_DISP) for lc in (2, 3) if self.key_exists(24, lc)]
+
+        n = min((len(result) for result in results), default=0)
+        if n == 0:
             print("No displacement found.")
             return None
 
+        nr_u = results[0]['m_nr'][:n].astype(np.int64)
+        ux, uy, uz = (np.sum([result[field][:n] for result in results], axis=0, dtype=np.float64)
+                      for field in ('m_ux', 'm_uy', 'm_uz'))
+        print(f"Max displacement: {max(ux)}")
+        return nr_u, ux, uy, uz
+
     def get_pos(self):
         """
         Get the positions from the CDB.
         """
-        ie = c_int(0)
-        RecLen = c_int(sizeof(cnode))
-        nr = []
-        x = []
-        y = []
-        z = []
-        while ie.value < 2:
-            if ie.value >= 1:
+        nodes = self.read_records(20, 0, CNODE)
+        if len(nodes) == 0:
+            print("No positions found.")
+            return None
+        xyz = nodes['m_xyz'].astype(np.float64)
+        return nodes['m_nr'].astype(np.int64), xyz[:, 0], xyz[:, 1], xyz[:, 2]
+
+    def read_metadata(self, load_cases=(2, 3), nodes=0):
+        """
+        Reads the control data of the given load cases (CLC_CTRL, key 12/LC) and the group table
+        (CGRP, key 11/0). The result is stored in self.metadata and meant to be passed to the
+        CDBinteract of later sessions on the same model.
+
+        :param load_cases: Load cases to look up.
+        :param nodes: Number of nodes.
+        :return: Dict with 'load_cases' {lc: {'kind', 'fact', 'psi0', 'psi1', 'psi2', 'title'}} of
+                 the existing load cases, 'groups' (CGRP records), 'elements' {element code: count},
+                 'nodes' and 'displacement_records' {lc: records of key 24/LC}.
+        """
+        found = {}
+        for lc in load_cases:
+            control = self.read_records(12, lc, CLC_CTRL)
+            if len(control) == 0:
+                continue
+            control = control[0]
+            found[lc] = {'kind': int(control['m_kind']), 'fact': float(control['m_fact']),
+                         'psi0': float(control['m_psi0']), 'psi1': float(control['m_psi1']),
+                         'psi2': float(control['m_psi2']),
+                         'title': control['m_rtex'].tobytes().decode('latin-1').rstrip('\x00 ')}
+        missing = [lc for lc in load_cases if lc not in found]
+        if missing:
+            print(f"Load case(s) {missing} not found in the CDB.")
+
+        groups = self.read_records(11, 0, CGRP)
+        elements = {}
+        for code, count in zip(groups['m_typ'].tolist(), groups['m_num'].tolist()):
+            elements[code] = elements.get(code, 0) + count
+
+        # Nodal results hold the CN_DISPC maximum records besides one record per node
+        records = {lc: self.record_count(24, lc) for lc in found}
+        self.metadata = {'load_cases': found, 'groups': groups, 'elements': elements, 'nodes': nodes,
+                         'displacement_records': records}
+        return self.metadata
+
+    def read_into(self, kwh, kwl, record_type, count=None):
+        """
+        Reads the records of a key into a preallocated buffer of count records, filled in place by
+        the backend. The buffer is doubled if the key holds more records; the end of the key is
+        read into a scratch record, so an exact count needs no second buffer.
+
+        :param count: Expected number of records (None: record_count, a missing key reads nothing).
+        :return: Structured array of the records read (view on the buffer).
+        """
+        if count is None:
+            count = self.record_count(kwh, kwl)
+        if count == 0 and not self.key_exists(kwh, kwl):
+            return np.zeros(0, dtype=np.dtype(record_type))
+        buffer = (record_type * max(count, 1))()
+        scratch = record_type()
+        rec_len = c_int()
+        n = 0
+        while True:
+            rec_len.value = sizeof(record_type)
+            if self.backend.get(kwh, kwl, buffer[n] if n < len(buffer) else scratch, rec_len, 1) > CDB_TRUNCATED:
                 break
-            ie.value = self.myDLL.sof_cdb_get(self.Index, 20, 0, byref(cnode), byref(RecLen), 1)
-            nr.append(cnode.m_nr)
-            x.append(cnode.m_xyz[0])
-            y.append(cnode.m_xyz[1])
-            z.append(cnode.m_xyz[2])
+            if n == len(buffer):
+                grown = (record_type * (2 * len(buffer)))()
+                memmove(grown, buffer, sizeof(buffer))
+                grown[n] = scratch
+                buffer = grown
+            n += 1
+        return np.frombuffer(buffer, dtype=np.dtype(record_type), count=n)
+
+    def key_exists(self, kwh, kwl):
+        """
+        Returns True if the key exists and holds data. Cached for the open session.
+        """
+        if (kwh, kwl) not in self.key_states:
+            self.key_states[(kwh, kwl)] = self.backend.key_exists(kwh, kwl)
+        return self.key_states[(kwh, kwl)] == KEY_WITH_DATA
 
-            # Always read the length of record before sof_cdb_get is called
-            RecLen = c_int(sizeof(cnode))
+    def record_lengths(self, kwh, kwl):
+        """
+        Returns the record lengths of a key (empty for a missing key). Cached for the open session.
+        """
+        if (kwh, kwl) not in self.key_lengths:
+            lengths = self.backend.record_lengths(kwh, kwl) if self.key_exists(kwh, kwl) else None
+            self.key_lengths[(kwh, kwl)] = lengths or []
+        return self.key_lengths[(kwh, kwl)]
 
-        if nr: 
-            return nr, x, y, z
-        else:
-            print("No positions found.")
+    def record_count(self, kwh, kwl):
+        """
+        Returns the number of records of a key. Cached for the open session.
+        """
+        return len(self.record_lengths(kwh, kwl))
+
+    def read_records(self, kwh, kwl, record_type):
+        """
+        Reads all records of a key in one pass into a NumPy structured array. When every record
+        has the length of the structure, they are read in place into a buffer of the exact size.
+
+        :param kwh: Primary key.
+        :param kwl: Secondary key (load case, number...).
+        :param record_type: ctypes structure describing the records (e.g. CN_DISP).
+        """
+        dtype = np.dtype(record_type)
+        lengths = self.record_lengths(kwh, kwl)
+        if all(length == dtype.itemsize for length in lengths):
+            return self.read_into(kwh, kwl, record_type, len(lengths))
+
+        # Records of another length than the structure (header records, other SOFiSTiK versions)
+        # are read into one byte arena at their returned lengths, then padded or truncated
+        arena = np.frombuffer(self.backend.read_arena(kwh, kwl, lengths), dtype=np.uint8)
+        lengths = np.array(lengths, dtype=np.int64)
+        offsets = np.cumsum(lengths) - lengths
+        data = np.zeros(len(lengths), dtype=dtype)
+        raw = data.view(np.uint8).reshape(len(lengths), dtype.itemsize)
+        for length in np.unique(lengths):
+            rows = np.flatnonzero(lengths == length)
+            size = min(int(length), dtype.itemsize)
+            first = offsets[rows[0]]
+            if np.array_equal(offsets[rows], first + length * np.arange(len(rows))):
+                # One run of consecutive records: a strided view instead of a gather
+                raw[rows[0]:rows[0] + len(rows), :size] = \
+                    arena[first:first + length * len(rows)].reshape(len(rows), length)[:, :size]
+            else:
+                raw[rows, :size] = arena[offsets[rows, None] + np.arange(size)]
+        return data
+
+    def read_elements(self, kwh, kwl, record_type):
+        """
+        Reads the element records of a key, skipping the header and maximum records (m_nr <= 0).
+        Nested ctypes arrays become subarray fields, e.g. m_sg of CQUAD_FOR is n x 8 x 4.
+        """
+        data = self.read_records(kwh, kwl, record_type)
+        return data[data['m_nr'] > 0]
+
+    def get_quads(self):
+        """
+        Reads the quad elements (CQUAD, key 200/0): m_nr, m_node (n x 4), m_mat, m_thick (n x 5)...
+        """
+        return self.read_elements(200, 0, CQUAD)
+
+    def get_quad_forces(self, lc):
+        """
+        Reads the quad element forces of a load case (CQUAD_FOR, key 210/LC): m_mxx ... m_nxy per
+        element and m_sg (n x 8 x 4) in the Gauss points.
+        """
+        return self.read_elements(210, lc, CQUAD_FOR)
+
+    def get_quad_stresses(self, lc):
+        """
+        Reads the quad element stresses of a load case (CQUAD_STR, key 220/LC). m_sg holds the four
+        Gauss points with the fields m_sigx, m_sigy, m_tau and m_sigz (each n x 4).
+        """
+        return self.read_elements(220, lc, CQUAD_STR)
+
+    def get_truss_results(self, lc):
+        """
+        Reads the truss results of a load case (CTRUS_RES, key 152/LC): m_nr, m_n, m_v...
+        """
+        return self.read_elements(152, lc, CTRUS_RES)
+
+    def get_cable_results(self, lc):
+        """
+        Reads the cable results of a load case (CCABL_RES, key 162/LC): m_nr, normal force m_n,
+        sag m_vq, relaxed length m_l0...
+        """
+        return self.read_elements(162, lc, CCABL_RES)
+
+    def get_spring_results(self, lc):
+        """
+        Reads the spring results of a load case (CSPRI_RES, key 170/LC): m_nr, m_p, m_m, m_v...
+        """
+        return self.read_elements(170, lc, CSPRI_RES)
+
+    def get_trusses(self):
+        """
+        Reads the truss elements (CTRUS, key 150/0): m_nr, m_node (n x 2), section m_nrq, length m_dl...
+        """
+        return self.read_elements(150, 0, CTRUS)
+
+    def get_cables(self):
+        """
+        Reads the cable elements (CCABL, key 160/0): m_nr, m_node (n x 2), section m_nrq, length m_dl...
+        """
+        return self.read_elements(160, 0, CCABL)
+
+    def get_beams(self):
+        """
+        Reads the beam elements (CBEAM, key 100/0): m_nr, m_node (n x 2), section m_np, length m_dl...
+        """
+        return self.read_elements(100, 0, CBEAM)
+
+    def get_sections(self, numbers):
+        """
+        Reads the total section values (CSECT, key 9/NR, record m_id 0) of the given sections.
+
+        :param numbers: Section numbers, e.g. the m_np column of get_beams.
+        :return: CSECT record array (m_a, m_iy, m_iz, m_em...), one row per section found, and the
+                 section numbers of the rows.
+        """
+        found = []
+        for nr in np.unique(numbers).tolist():
+            records = self.read_records(9, nr, CSECT)
+            records = records[records['m_id'] == 0]
+            if len(records):
+                found.append((nr, records[0]))
+        if not found:
+            return np.zeros(0, dtype=np.dtype(CSECT)), np.zeros(0, dtype=np.int64)
+        return np.array([record for _, record in found]), np.array([nr for nr, _ in found], dtype=np.int64)
+
+    def get_increments(self, lc):
+        """
+        Reads the displacement increments (m_ux, m_uy, m_uz...) and residual forces (m_px, m_py,
+        m_pz...) of the last solver iteration of a load case (CN_DISPI, key 26/LC).
+        """
+        return self.read_elements(26, lc, CN_DISPI)
+
+    def get_max_increments(self, lc):
+        """
+        Reads the maximum displacement increments and residual forces of a load case (CN_DISPIC,
+        key 26/LC:0).
+
+        :return: CN_DISPIC record array of length 1, empty if the load case has none.
+        """
+        data = self.read_records(26, lc, CN_DISPIC)
+        return data[data['m_id'] == 0][:1]
+
+    def get_coordinate_offsets(self, lc):
+        """
+        Reads the coordinate offsets computed by the solver for a load case (CN_DISPT, key 27/LC).
+        """
+        return self.read_elements(27, lc, CN_DISPT)
+
+    def get_max_coordinate_offsets(self, lc):
+        """
+        Reads the maximum coordinate offsets of a load case (CN_DISPTC, key 27/LC:0).
+
+        :return: CN_DISPTC record array of length 1, empty if the load case has none.
+        """
+        data = self.read_records(27, lc, CN_DISPTC)
+        return data[data['m_id'] == 0][:1]
+
+    def export_npy(self, directory, keys=None):
+        """
+        Exports record types to one .npy file per key and load case, to be opened later with load_npy.
+
+        :param directory: Output directory, created if needed.
+        :param keys: List of (kwh, kwl, record_type), default nodes and the displacements of LC 2 and 3.
+        :return: List of the written file paths.
+        """
+        if keys is None:
+            keys = [(20, 0, CNODE), (24, 2, CN_DISP), (24, 3, CN_DISP)]
+
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for kwh, kwl, record_type in keys:
+            data = self.read_records(kwh, kwl, record_type)
+            if len(data) == 0:
+                print(f"No records for key {kwh}/{kwl}, nothing exported.")
+                continue
+            path = os.path.join(directory, npy_file_name(kwh, kwl))
+            np.save(path, data)
+            paths.append(path)
+            print(f"Exported {len(data)} records of key {kwh}/{kwl} to '{path}'.")
+        return paths
+
+def npy_file_name(kwh, kwl):
+    """
+    Returns the file name used by CDBinteract.export_npy for a key.
+    """
+    return f"cdb_{kwh}_{kwl}.npy"
+
+def load_npy(directory, kwh, kwl):
+    """
+    Opens an exported key memory-mapped (read-only, zero-copy).
+
+    :param directory: Directory passed to CDBinteract.export_npy.
+    :param kwh: Primary key.
+    :param kwl: Secondary key.
+    :return: Structured array with the fields of the record type, or None if the key was not exported.
+    """
+    path = os.path.join(directory, npy_file_name(kwh, kwl))
+    if not os.path.isfile(path):
+        print(f"No export found for key {kwh}/{kwl} in '{directory}'.")
+        return None
+    return np.load(path, mmap_mode='r')
+
+def model_file_path(cdb_file_path, suffix):
+    """
+    Returns the path of a file kept beside the CDB, e.g. model_properties.npz for model.cdb.
+    """
+    return os.path.splitext(cdb_file_path)[0] + f'_{suffix}.npz'
+
+def load_model_file(cdb_file_path, suffix, model_hash):
+    """
+    Loads the arrays saved beside the CDB by save_model_file.
+
+    :param cdb_file_path: Path of the CDB.
+    :param suffix: Name of the file beside the CDB, see model_file_path.
+    :param model_hash: SolutionStore.model_hash of the model the arrays must belong to.
+    :return: Dictionary of arrays, or None if missing or saved for another model.
+    """
+    path = model_file_path(cdb_file_path, suffix)
+    if not os.path.isfile(path):
+        return None
+    with np.load(path) as data:
+        if str(data['model_hash']) != model_hash:
             return None
+        return {name: data[name] for name in data.files if name != 'model_hash'}
+
+def save_model_file(cdb_file_path, suffix, model_hash, **arrays):
+    """
+    Saves arrays beside the CDB together with the hash of the model they were read from.
+    """
+    np.savez(model_file_path(cdb_file_path, suffix), model_hash=model_hash, **arrays)
 
 class SofiFileHandler:
     def __init__(self):
@@ -439,9 +705,11 @@ class SofiFileHandler:
         """
         self.cdb_file_path = os.path.abspath(os.path.normpath(cdb_file_path))
 
-    def calculate_with_sps(self):
+    def calculate_with_sps(self, queue=None, priority=0):
         """
         Executes the calculation of the current .dat file using SOFiSTiK in batch mode via sps.exe.
+        :param queue: Optional SolverQueue through which sps.exe is started (licence-aware).
+        :param priority: Priority of the job in the queue.
         """
         if not self.dat_file_path:
             print("Error: .dat file path is not set. Use add_dat() to set the file path.")
@@ -463,16 +731,24 @@ class SofiFileHandler:
             # Command to run sps.exe with the specified .dat file
             sps_command = [sps_exe, self.dat_file_path]
 
-            # Launch sps.exe with the .dat file and wait for it to complete
-            process = subprocess.Popen(
-                sps_command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                creationflags=subprocess.CREATE_NO_WINDOW
-            )
+            if queue is not None:
+                # Wait for a free solver slot on this host, then run sps.exe
+                process = queue.execute(sps_command, priority)
+                if process is None:
+                    print("Calculation cancelled.")
+                    return
+                stdout, stderr = process.stdout, process.stderr
+            else:
+                # Launch sps.exe with the .dat file and wait for it to complete
+                process = subprocess.Popen(
+                    sps_command,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    creationflags=subprocess.CREATE_NO_WINDOW
+                )
 
-            # Wait for the process to complete
-            stdout, stderr = process.communicate()
+                # Wait for the process to complete
+                stdout, stderr = process.communicate()
 
             # Check if the process finished successfully
             if process.returncode == 0:
@@ -485,22 +761,480 @@ class SofiFileHandler:
             print(f"Error during SOFiSTiK execution: {e}")
 
 
+class NodeIndex:
+    def __init__(self, nr):
+        """
+        Sorted, array-backed index of node numbers. Node numbering does not change during a run,
+        so the index is built once from the CNODE read and reused by every iteration. Element
+        numbers (cables, trusses...) are indexed the same way.
+
+        :param nr: Node numbers in CNODE read order (0 entries are ignored).
+        """
+        nr = np.asarray(nr, dtype=np.int64)
+        valid = np.flatnonzero(nr != 0)
+        order = valid[np.argsort(nr[valid], kind='stable')]
+        sorted_nr = nr[order]
+        # Keep the last row of duplicated node numbers
+        last = np.append(sorted_nr[1:] != sorted_nr[:-1], True) if len(sorted_nr) else np.zeros(0, dtype=bool)
+        self.nr = sorted_nr[last]
+        self.rows = order[last]
+
+    def __len__(self):
+        return len(self.nr)
+
+    def positions(self, nr):
+        """
+        Returns the position of each node number in the index, -1 for unknown nodes.
+
+        :param nr: Node numbers, e.g. the m_nr column of a result table.
+        """
+        nr = np.asarray(nr, dtype=np.int64)
+        if len(self.nr) == 0:
+            return np.full(nr.shape, -1, dtype=np.int64)
+        pos = np.searchsorted(self.nr, nr)
+        pos_clipped = np.minimum(pos, len(self.nr) - 1)
+        return np.where(self.nr[pos_clipped] == nr, pos_clipped, -1)
+
+    def gather(self, values):
+        """
+        Reorders a column of the node table (CNODE read order) into index order.
+
+        :param values: Column read together with the node numbers.
+        """
+        return np.asarray(values, dtype=float)[self.rows]
+
+    def scatter_add(self, nr, values):
+        """
+        Sums a result column per node in index order. Rows of unknown nodes are dropped, nodes
+        without result get 0.
+
+        :param nr: Node numbers of the result table.
+        :param values: Result column (e.g. ux).
+        """
+        pos = self.positions(nr)
+        keep = pos >= 0
+        weights = np.asarray(values, dtype=float)[keep]
+        return np.bincount(pos[keep], weights=weights, minlength=len(self.nr))
+
+class NodeTable:
+    """
+    Node numbers with their reference and current coordinates in contiguous arrays (int32 and
+    float64), rows in NodeIndex order.
+    """
+    __slots__ = ('nr', 'xyz0', 'xyz')
+
+    def __init__(self, nr, xyz):
+        """
+        :param nr: Node numbers.
+        :param xyz: Reference (undeformed) coordinates, n x 3.
+        """
+        self.nr = np.ascontiguousarray(nr, dtype=np.int32)
+        self.xyz0 = np.array(xyz, dtype=np.float64, order='C').reshape(-1, 3)
+        self.xyz = self.xyz0.copy()
+
+    def __len__(self):
+        return len(self.nr)
+
+    @property
+    def x(self):
+        return self.xyz[:, 0]
+
+    @property
+    def y(self):
+        return self.xyz[:, 1]
+
+    @property
+    def z(self):
+        return self.xyz[:, 2]
+
+    @property
+    def nbytes(self):
+        return self.nr.nbytes + self.xyz0.nbytes + self.xyz.nbytes
+
+    def update(self, displacement):
+        """
+        Sets the current coordinates to the reference coordinates plus a displacement (n x 3).
+
+        :return: The current coordinates.
+        """
+        np.add(self.xyz0, displacement, out=self.xyz)
+        return self.xyz
+
+    def displacement(self):
+        """
+        Returns the current coordinates minus the reference coordinates.
+        """
+        return self.xyz - self.xyz0
+
+    def diff(self, previous):
+        """
+        Returns the coordinate change since a snapshot (n x 3).
+        """
+        return self.xyz - previous
+
+    def snapshot(self):
+        """
+        Returns a copy of the current coordinates, to be given to diff or restore.
+        """
+        return self.xyz.copy()
+
+    def restore(self, snapshot):
+        """
+        Sets the current coordinates back to a snapshot.
+        """
+        self.xyz[:] = snapshot
+
+class ElementProperties:
+    def __init__(self, beams, sections, section_nr):
+        """
+        Beam and section properties of a model, read once from the CDB and kept beside it.
+
+        :param beams: CBEAM records (m_nr, m_node, m_np, m_dl).
+        :param sections: CSECT records (m_a, m_iy, m_iz, m_em).
+        :param section_nr: Section number of each CSECT record.
+        """
+        self.beam_nr = np.asarray(beams['m_nr'], dtype=np.int64)
+        self.beam_nodes = np.asarray(beams['m_node'], dtype=np.int64).reshape(-1, 2)
+        self.beam_section = np.asarray(beams['m_np'], dtype=np.int64)
+        self.beam_length = np.asarray(beams['m_dl'], dtype=np.float64)
+        self.section_nr = np.asarray(section_nr, dtype=np.int64)
+        self.area = np.asarray(sections['m_a'], dtype=np.float64)
+        self.iy = np.asarray(sections['m_iy'], dtype=np.float64)
+        self.iz = np.asarray(sections['m_iz'], dtype=np.float64)
+        self.modulus = np.asarray(sections['m_em'], dtype=np.float64)
+
+    @classmethod
+    def read(cls, cdb):
+        """
+        Reads the beams and their sections from an open CDBinteract.
+        """
+        beams = cdb.get_beams()
+        sections, section_nr = cdb.get_sections(beams['m_np'])
+        print(f"Properties of {len(beams)} beams and {len(section_nr)} sections read from the CDB.")
+        return cls(beams, sections, section_nr)
+
+    @classmethod
+    def load(cls, cdb_file_path, model_hash):
+        """
+        Loads the properties saved beside the CDB, None if missing or saved for another model.
+        """
+        data = load_model_file(cdb_file_path, 'properties', model_hash)
+        if data is None:
+            return None
+        beams = {'m_nr': data['beam_nr'], 'm_node': data['beam_nodes'], 'm_np': data['beam_section'],
+                 'm_dl': data['beam_length']}
+        sections = {'m_a': data['area'], 'm_iy': data['iy'], 'm_iz': data['iz'], 'm_em': data['modulus']}
+        return cls(beams, sections, data['section_nr'])
+
+    def save(self, cdb_file_path, model_hash):
+        save_model_file(cdb_file_path, 'properties', model_hash, beam_nr=self.beam_nr, beam_nodes=self.beam_nodes,
+                        beam_section=self.beam_section, beam_length=self.beam_length, section_nr=self.section_nr,
+                        area=self.area, iy=self.iy, iz=self.iz, modulus=self.modulus)
+
+    def node_flexibility(self, node_index):
+        """
+        Returns a flexibility per node relative to the median node: the inverse of the summed
+        bending (E I_min / L^3) and axial (E A / L) stiffnesses of the beams at the node. Nodes
+        without beam or section get 1.
+
+        :param node_index: NodeIndex of the run.
+        """
+        flexibility = np.ones(len(node_index))
+        if len(self.beam_nr) == 0 or len(self.section_nr) == 0:
+            return flexibility
+        rows = NodeIndex(self.section_nr).positions(self.beam_section)
+        known = (rows >= 0) & (self.beam_length > 0)
+        rows, length = rows[known], self.beam_length[known]
+        modulus = self.modulus[rows]
+        stiffness = (modulus * np.minimum(self.iy[rows], self.iz[rows]) / length ** 3
+                     + modulus * self.area[rows] / length)
+        nodes = self.beam_nodes[known]
+        node_stiffness = (node_index.scatter_add(nodes[:, 0], stiffness)
+                          + node_index.scatter_add(nodes[:, 1], stiffness))
+
+        stiff = node_stiffness > 0
+        if np.any(stiff):
+            flexibility[stiff] = np.median(node_stiffness[stiff]) / node_stiffness[stiff]
+        return flexibility
+
+class ConnectivityGraph:
+    def __init__(self, nr, indptr, indices, fixed):
+        """
+        Node adjacency of the structure in CSR form: the neighbours of the node at position i of
+        nr are nr[indices[indptr[i]:indptr[i + 1]]], sorted. Nodes are adjacent when they belong to
+        the same element (beam, truss, cable, quad).
+
+        :param nr: Sorted node numbers (NodeIndex.nr).
+        :param indptr: Start of the neighbour list of each node (len(nr) + 1).
+        :param indices: Neighbour positions.
+        :param fixed: True for the nodes with a fixed degree of freedom (CNODE m_kfix).
+        """
+        self.nr = np.asarray(nr, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.fixed = np.asarray(fixed, dtype=bool)
+        self.labels = None
+
+    @classmethod
+    def from_elements(cls, node_index, element_nodes, fixed=None):
+        """
+        Builds the graph from element node lists.
+
+        :param node_index: NodeIndex of the run.
+        :param element_nodes: Node number arrays (elements x nodes per element). 0 entries, e.g. the
+                              fourth node of a triangle, and unknown nodes are skipped.
+        :param fixed: True per node in index order for the supported nodes (None: none).
+        """
+        n = len(node_index)
+        edges = []
+        for nodes in element_nodes:
+            nodes = np.asarray(nodes, dtype=np.int64)
+            if nodes.ndim != 2 or len(nodes) == 0:
+                continue
+            pos = node_index.positions(nodes)
+            for a in range(nodes.shape[1]):
+                for b in range(a + 1, nodes.shape[1]):
+                    edges.append(pos[:, [a, b]])
+
+        edges = np.concatenate(edges) if edges else np.zeros((0, 2), dtype=np.int64)
+        edges = edges[(edges[:, 0] >= 0) & (edges[:, 1] >= 0) & (edges[:, 0] != edges[:, 1])]
+        # Both directions, each pair once
+        codes = np.sort(np.concatenate([edges[:, 0] * n + edges[:, 1], edges[:, 1] * n + edges[:, 0]]))
+        codes = codes[np.append(True, codes[1:] != codes[:-1])] if len(codes) else codes
+        rows, indices = codes // max(n, 1), codes % max(n, 1)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n))])
+        if fixed is None:
+            fixed = np.zeros(n, dtype=bool)
+        return cls(node_index.nr, indptr, indices, fixed)
+
+    @classmethod
+    def read(cls, cdb, node_index):
+        """
+        Builds the graph from the beams, trusses, cables and quads of an open CDBinteract, the
+        supports from the CNODE degrees of freedom.
+        """
+        elements = [cdb.get_beams()['m_node'], cdb.get_trusses()['m_node'], cdb.get_cables()['m_node'],
+                    cdb.get_quads()['m_node']]
+        nodes = cdb.read_records(20, 0, CNODE)
+        nodes = nodes[nodes['m_nr'] > 0]
+        fixed = node_index.scatter_add(nodes['m_nr'], nodes['m_kfix'] != 0) > 0
+        graph = cls.from_elements(node_index, elements, fixed)
+        print(f"Connectivity of {len(graph.nr)} nodes built from {sum(len(e) for e in elements)} elements, "
+              f"{len(graph.indices) // 2} edges.")
+        return graph
+
+    @classmethod
+    def load(cls, cdb_file_path, model_hash):
+        """
+        Loads the graph saved beside the CDB, None if missing or saved for another model.
+        """
+        data = load_model_file(cdb_file_path, 'graph', model_hash)
+        if data is None:
+            return None
+        return cls(data['nr'], data['indptr'], data['indices'], data['fixed'])
+
+    def save(self, cdb_file_path, model_hash):
+        save_model_file(cdb_file_path, 'graph', model_hash, nr=self.nr, indptr=self.indptr, indices=self.indices,
+                        fixed=self.fixed)
+
+    def degree(self):
+        return np.diff(self.indptr)
+
+    def neighbours(self, nr):
+        """
+        Returns the node numbers adjacent to a node (empty for an unknown node).
+        """
+        pos = np.searchsorted(self.nr, nr)
+        if pos >= len(self.nr) or self.nr[pos] != nr:
+            return np.zeros(0, dtype=np.int64)
+        return self.nr[self.indices[self.indptr[pos]:self.indptr[pos + 1]]]
+
+    def expand(self, mask, hops=1):
+        """
+        Grows a set of nodes by their neighbours.
+
+        :param mask: True per node in index order.
+        :param hops: Number of neighbour rings added.
+        :return: New mask.
+        """
+        mask = np.asarray(mask, dtype=bool).copy()
+        rows = np.repeat(np.arange(len(self.nr)), self.degree())
+        for _ in range(hops):
+            grown = mask.copy()
+            grown[rows[mask[self.indices]]] = True
+            if np.array_equal(grown, mask):
+                break
+            mask = grown
+        return mask
+
+    def components(self):
+        """
+        Labels the connected components: label per node in index order, numbered 0, 1... in order of
+        their smallest node. Computed by hooking the larger root of every edge onto the smaller one
+        and halving the paths, so the number of rounds grows with log(n) rather than with the
+        diameter of the structure.
+        """
+        if self.labels is not None:
+            return self.labels
+        parent = np.arange(len(self.nr))
+        rows = np.repeat(np.arange(len(self.nr)), self.degree())
+        while True:
+            low = np.minimum(parent[rows], parent[self.indices])
+            high = np.maximum(parent[rows], parent[self.indices])
+            changed = low != high
+            if not np.any(changed):
+                break
+            np.minimum.at(parent, high[changed], low[changed])
+            while True:
+                grand = parent[parent]
+                if np.array_equal(grand, parent):
+                    break
+                parent = grand
+        self.labels = np.unique(parent, return_inverse=True)[1].reshape(-1)
+        return self.labels
+
+    def unsupported_components(self):
+        """
+        Returns the labels of the components without any fixed node: they can move as a rigid body.
+        """
+        labels = self.components()
+        count = labels.max() + 1 if len(labels) else 0
+        supported = np.bincount(labels[self.fixed], minlength=count) > 0
+        return np.flatnonzero(~supported)
+
+class RelaxationPolicy:
+    def __init__(self, flexibility, minimum=0.05, maximum=2.0):
+        """
+        Relaxed displacement update d = d_prev + w * (d_computed - d_prev), with a factor w per node
+        chosen from the member stiffnesses. The iteration is modelled as d_computed changing by
+        mu * flexibility times the change of the written displacements, mu being a complex number
+        (a rotation for coupled directions) fitted by least squares on the last two passes. The
+        factor minimising the resulting error, w = Re(1 - lambda) / |1 - lambda|^2 with
+        lambda = mu * flexibility, under-relaxes flexible members when the iteration overshoots or
+        spirals and over-relaxes them when it creeps. After a pass where the residual grew, the
+        factors go back to 1 for one pass.
+
+        :param flexibility: Relative flexibility per node, see ElementProperties.node_flexibility.
+        :param minimum: Smallest factor.
+        :param maximum: Largest factor.
+        """
+        self.flexibility = np.asarray(flexibility, dtype=np.float64)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets the previous passes (new load step, restored state), starting again from w = 1.
+        """
+        self.factors = np.ones(len(self.flexibility))
+        self.previous = None
+
+    def relax(self, displacement, computed):
+        """
+        :param displacement: Displacements written for the last solver run (n x 3).
+        :param computed: Displacements computed by that run (n x 3).
+        :return: Displacements to write next.
+        """
+        residual = computed - displacement
+        if self.previous is not None:
+            change = displacement - self.previous[0]
+            # Change of the computed displacements caused by the change of the written ones
+            response = residual - self.previous[1] + change
+            weighted = self.flexibility[:, None] * change
+            denominator = np.vdot(weighted, weighted)
+            if np.linalg.norm(residual) > np.linalg.norm(self.previous[1]) and np.any(self.factors != 1):
+                self.factors = np.ones(len(self.flexibility))
+            elif denominator > 0:
+                real = np.vdot(weighted, response) / denominator
+                imaginary = np.sqrt(max(np.vdot(response, response) / denominator - real ** 2, 0.0))
+                damping = 1.0 - real * self.flexibility
+                self.factors = np.clip(damping / np.maximum(damping ** 2 + (imaginary * self.flexibility) ** 2, 1e-12),
+                                       self.minimum, self.maximum)
+                print(f"Relaxation: mu {real:.3g}{imaginary:+.3g}i, factors {self.factors.min():.3g} "
+                      f"to {self.factors.max():.3g}")
+        self.previous = (displacement.copy(), residual)
+        return displacement + self.factors[:, None] * residual
+
 class Iteration:
-    def __init__(self, V, H, epsilon, cdb_file_path, dat_file, sofistik_path):
+    def __init__(self, V, H, epsilon, cdb_file_path, dat_file, sofistik_path, cdb_backend=None,
+                 solver=None, solution_store=None, load_stepping=False, solver_queue=None,
+                 partial_execution=False, defer_graphics=False, coordinate_precision=None, history=None,
+                 cable_tolerance=None, increment_tolerance=None, residual_tolerance=None,
+                 coordinate_offsets=False, relaxation=False, connectivity=False, node_grid=False):
         self.epsilon = epsilon
         self.cdb_file_path = cdb_file_path 
         self.dat_file = dat_file
         self.sofistik_path = sofistik_path
-        self.nr = None
-        self.x = None
-        self.y = None
-        self.z = None
+        self.nodes = None
         self.nr_u = None
         self.ux = None
         self.uy = None
         self.uz = None
+        self.node_index = None
+        self.template = None
+        # Decimals of the coordinates written to the .dat file (None: two digits below epsilon)
+        if coordinate_precision is None:
+            coordinate_precision = max(0, int(np.ceil(-np.log10(epsilon)))) + 2 if epsilon > 0 else 8
+        self.coordinate_precision = coordinate_precision
         self.V = V
         self.H = H
+        # CDBBackend shared by all reads (None: load the DLL on each read)
+        self.cdb_backend = cdb_backend
+        # Callable run with the .dat path instead of sps.exe (None: sps.exe)
+        self.solver = solver
+        # SolverQueue through which sps.exe is started (None: started directly)
+        self.solver_queue = solver_queue
+        # SolutionStore used to warm start from and to record converged runs
+        self.solution_store = solution_store
+        self.model_hash = None
+        # IterationHistory recording the coordinates and displacements of every pass
+        self.history = history
+        # Also stop once the cable forces change by less than cable_tolerance x the largest force
+        self.cable_tolerance = cable_tolerance
+        self.cable_index = None
+        self.cable_forces = None
+        # Stop without a confirmation run once the solver's own increments (CN_DISPI) are below
+        # increment_tolerance, and its residual forces below residual_tolerance when given
+        self.increment_tolerance = increment_tolerance
+        self.residual_tolerance = residual_tolerance
+        # Read the displacements from the CN_DISPT coordinate offsets instead of CN_DISP, once
+        # they matched on the first pass
+        self.coordinate_offsets = coordinate_offsets
+        self.offsets_validated = False
+        # Load case and group metadata read from the CDB on the first pass (see CDBinteract.read_metadata)
+        self.cdb_metadata = None
+        # Stiffness-aware relaxation of the displacement updates (see RelaxationPolicy)
+        self.relaxation = relaxation
+        self.properties = None
+        self.relaxation_policy = None
+        # Node adjacency of the model (see ConnectivityGraph)
+        self.connectivity = connectivity
+        self.graph = None
+        # NodeGrid over the current coordinates, for nearest-node and box queries
+        self.node_grid = node_grid
+        self.grid = None
+        self.solver_runs = 0
+        # Semaphore limiting concurrent solver runs of iterations sharing a process (see PipelinedExecutor)
+        self.solver_slots = None
+        self.solver_time = 0.0
+        self.solver_wait_time = 0.0
+        self.iterations = 0
+        self.displacement = None
+        # Rerun only the coordinate-dependent PROG blocks between iterations, graphics once at the end
+        self.partial_execution = partial_execution
+        # Disable the graphical output blocks until convergence (implied by partial_execution)
+        self.defer_graphics = defer_graphics
+        # Adaptive load stepping, see loop_load_stepping
+        self.load_stepping = load_stepping
+        self.initial_load_step = 0.25
+        self.min_load_step = 1e-3
+        self.loose_epsilon = None
+        self.max_step_iterations = 20
+        # Passes allowed on the full load at epsilon, by loop as well (None: no limit)
+        self.max_final_iterations = None
+        self.fast_iterations = 3
+        self.slow_iterations = 8
 
     def initialize(self):
         # load dat, replace sofiload, and add linear analysis to DAT file
@@ -512,77 +1246,416 @@ class Iteration:
         # Modify load values
         DAT_interaction.modify('NODE NO 1002 TYPE PG P1', str(self.V))
         DAT_interaction.modify('NODE NO 1002 TYPE PX P1', str(self.H))
+
+        # Later writes only fill the coordinate and load slots of the compiled file
+        self.template = DatTemplate.from_file(self.dat_file, precision=self.coordinate_precision)
         
-        CDBstatus = CDBinteract()
+        CDBstatus = CDBinteract(self.cdb_backend)
         CDBstatus.open_cdb(self.cdb_file_path)
-        self.nr, self.x, self.y, self.z = CDBstatus.get_pos()
-        S = [0] * len(self.nr)
-        self.nr_u, self.ux, self.uy, self.uz = S, S, S, S
+        nr, x, y, z = CDBstatus.get_pos()
+
+        # Node numbering is fixed for the run: index it once
+        self.node_index = NodeIndex(nr)
+        xyz0 = np.column_stack([self.node_index.gather(c) for c in (x, y, z)])
+        self.use_dat_coordinates(xyz0)
+        self.nodes = NodeTable(self.node_index.nr, xyz0)
+        if self.node_grid:
+            self.grid = NodeGrid(self.node_index.nr, xyz0)
+        if self.relaxation:
+            self.load_properties(CDBstatus)
+        if self.connectivity:
+            self.load_connectivity(CDBstatus)
         CDBstatus.close_cdb()
+        self.nr_u = np.zeros(len(nr), dtype=np.int64)
+        self.ux, self.uy, self.uz = np.zeros(len(nr)), np.zeros(len(nr)), np.zeros(len(nr))
+        self.displacement = np.zeros_like(self.nodes.xyz)
+
+        if self.solution_store is not None:
+            self.warm_start()
+
+        # Compute a first time the displacement (load stepping starts from its first step instead)
+        if not self.load_stepping:
+            self.calculate()
+
+    def load_model_data(self, data_class, read):
+        """
+        Loads model data saved beside the CDB for this model, or reads it and saves it.
+
+        :param data_class: Class with load(cdb_file_path, model_hash) and save, e.g. ElementProperties.
+        :param read: Callable reading the data from the open CDB when nothing is saved.
+        """
+        self.model_hash = SolutionStore.model_hash(self.dat_file, self.node_index.nr, self.nodes.xyz0)
+        data = data_class.load(self.cdb_file_path, self.model_hash)
+        if data is None:
+            data = read()
+            data.save(self.cdb_file_path, self.model_hash)
+        return data
+
+    def load_properties(self, cdb):
+        """
+        Loads the beam and section properties saved beside the CDB for this model, or reads them
+        from the open CDB and saves them, then sets up the relaxation policy.
+        """
+        self.properties = self.load_model_data(ElementProperties, lambda: ElementProperties.read(cdb))
+        self.relaxation_policy = RelaxationPolicy(self.properties.node_flexibility(self.node_index))
+
+    def load_connectivity(self, cdb):
+        """
+        Loads the connectivity graph saved beside the CDB for this model, or builds it from the open
+        CDB and saves it, then reports the parts of the model without support.
+        """
+        self.graph = self.load_model_data(ConnectivityGraph, lambda: ConnectivityGraph.read(cdb, self.node_index))
+        labels = self.graph.components()
+        unsupported = self.graph.unsupported_components()
+        if len(unsupported):
+            nodes = self.graph.nr[np.isin(labels, unsupported)]
+            print(f"Warning: {len(unsupported)} of {labels.max() + 1} part(s) without support "
+                  f"({len(nodes)} nodes, e.g. node {nodes[0]}) can move as a rigid body.")
+
+    def use_dat_coordinates(self, xyz0):
+        """
+        Replaces the float32 CNODE coordinates by the double-precision values of the .dat file
+        where both agree to float32 accuracy, so the float32 rounding is not written back.
+
+        :param xyz0: CNODE coordinates in node index order, updated in place.
+        """
+        dat_nr, dat_xyz = self.template.coordinates()
+        rows = self.node_index.positions(dat_nr)
+        known = rows >= 0
+        rows, dat_xyz = rows[known], dat_xyz[known]
+        tolerance = 1e-6 * np.maximum(1.0, np.abs(xyz0[rows]))
+        agree = np.all(np.abs(dat_xyz - xyz0[rows]) <= tolerance, axis=1)
+        xyz0[rows[agree]] = dat_xyz[agree]
+        if not np.all(agree):
+            print(f"{np.count_nonzero(~agree)} node(s) differ between the .dat file and the CDB, CDB coordinates kept.")
+
+    def warm_start(self):
+        """
+        Seeds the .dat coordinates with the displacements of the nearest converged load cases.
+        """
+        self.model_hash = SolutionStore.model_hash(self.dat_file, self.node_index.nr, self.nodes.xyz0)
+        solution = self.solution_store.lookup(self.model_hash, self.V, self.H)
+        if solution is None:
+            print("No stored solution for this model, starting from the undeformed geometry.")
+            return
+
+        nr, displacement = solution
+        pos = self.node_index.positions(nr)
+        self.displacement[pos[pos >= 0]] = displacement[pos >= 0]
+        self.write_coordinates(self.nodes.update(self.displacement))
+
+    def calculate(self, blocks=None):
+        """
+        Runs the solver on the .dat file, sps.exe unless a solver callable was given.
+
+        :param blocks: With partial_execution or defer_graphics, indices of the template blocks to
+                       run (None: the blocks given by intermediate_blocks).
+        """
+        if self.partial_execution or self.defer_graphics:
+            if blocks is None:
+                blocks = self.intermediate_blocks()
+            self.template.run_only(blocks)
+            self.template.write(self.dat_file)
+
+        start = time.perf_counter()
+        if self.solver_slots is not None:
+            self.solver_slots.acquire()
+        started = time.perf_counter()
+        self.solver_wait_time += started - start
+        try:
+            self.solver_runs += 1
+            if self.solver is not None:
+                self.solver(self.dat_file)
+                return
+
+            iterate = SofiFileHandler()
+            iterate.add_sps(self.sofistik_path)  # Setting the SOFiSTiK path
+            iterate.add_cdb(self.cdb_file_path)
+            iterate.add_dat(self.dat_file)
+            iterate.calculate_with_sps(self.solver_queue)
+        finally:
+            self.solver_time += time.perf_counter() - started
+            if self.solver_slots is not None:
+                self.solver_slots.release()
 
-        # Compute a first time the displacement
-        first_iteration = SofiFileHandler()
-        first_iteration.add_sps(self.sofistik_path)  # Setting the SOFiSTiK path
-        first_iteration.add_cdb(self.cdb_file_path)
-        first_iteration.add_dat(self.dat_file)
-        first_iteration.calculate_with_sps()
-        
     def loop(self):
-        delta_ux = self.epsilon + 1        
-        DAT_interaction = FileInteraction(self.dat_file)
+        """
+        Iterates the geometry until convergence, through load steps when load_stepping is set.
+        """
+        if self.load_stepping:
+            converged = self.loop_load_stepping()
+        else:
+            converged = self.converge(self.epsilon, self.max_final_iterations)
+
+        if converged and self.solution_store is not None:
+            self.solution_store.save(self.model_hash, self.V, self.H, self.node_index.nr, self.displacement)
+        if self.partial_execution or self.defer_graphics:
+            self.finish_deferred_graphics(converged)
+        return converged
 
-        while delta_ux > self.epsilon:
+    def intermediate_blocks(self):
+        """
+        Returns the template blocks run before convergence: never the graphical output, and with
+        partial_execution only the coordinate-dependent blocks once the first run is done.
+        """
+        if self.partial_execution and self.solver_runs > 0:
+            return self.template.coordinate_dependent_blocks()
+        return self.template.non_graphics_blocks()
+
+    def finish_deferred_graphics(self, converged):
+        """
+        Runs the graphical output blocks once on the converged state, then restores the original
+        +PROG/-PROG markers in the .dat file.
+        """
+        graphics = self.template.graphics_blocks()
+        if converged and graphics:
+            print("Running graphical output on the converged geometry.")
+            self.calculate(graphics)
+        self.template.run_only(None)
+        self.template.write(self.dat_file)
+
+    def converge(self, epsilon, max_iterations=None):
+        """
+        Fixed-point loop on the node coordinates at the loads currently in the .dat file.
+
+        :param epsilon: Convergence tolerance on the maximum displacement.
+        :param max_iterations: Number of passes after which the loop gives up (None: no limit).
+        :return: True when converged, False after max_iterations passes or when the displacements
+                 are no longer finite.
+        """
+        delta_ux = epsilon + 1
+        self.iterations = 0
+        if self.relaxation_policy is not None:
+            self.relaxation_policy.reset()
+
+        while not delta_ux <= epsilon:
+            if max_iterations is not None and self.iterations >= max_iterations:
+                print(f"No convergence after {self.iterations} iterations, delta_ux = {delta_ux}.")
+                return False
+            self.iterations += 1
             print("delta_ux :", delta_ux)
             ux_prev = self.ux.copy()
 
             # Open cdb and get data after sps.exe has finished
-            CDBstatus = CDBinteract()
+            CDBstatus = CDBinteract(self.cdb_backend, self.cdb_metadata)
             CDBstatus.open_cdb(self.cdb_file_path)
-            self.nr_u, self.ux, self.uy, self.uz = CDBstatus.get_u()
-            print(len(self.nr), self.nr)
-            print(len(self.nr_u), self.nr_u)
-            print(len(self.ux), self.ux)
+            if self.cdb_metadata is None:
+                self.cdb_metadata = CDBstatus.read_metadata((2, 3), len(self.node_index))
+            offsets = self.read_coordinate_offsets(CDBstatus) if self.coordinate_offsets else None
+            if offsets is None:
+                self.nr_u, self.ux, self.uy, self.uz = CDBstatus.get_u()
+                print(len(self.nodes), self.nodes.nr)
+                print(len(self.nr_u), self.nr_u)
+                print(len(self.ux), self.ux)
+            else:
+                # Offsets come in index order: no join needed
+                self.nr_u = self.node_index.nr
+                self.ux, self.uy, self.uz = offsets.T
+            delta_n = self.read_cable_forces(CDBstatus) if self.cable_tolerance is not None else None
+            increments = self.read_increments(CDBstatus) if self.increment_tolerance is not None else None
             CDBstatus.close_cdb()
 
-            # Process positions and displacements
-            unique_positions = {}
-            for nr, x, y, z in zip(self.nr, self.x, self.y, self.z):
-                if nr != 0:
-                    unique_positions[nr] = (x, y, z)
-
-            unique_displacements = {}
-            for nr_u, ux, uy, uz in zip(self.nr_u, self.ux, self.uy, self.uz):
-                if nr_u != 0:
-                    if nr_u in unique_displacements:
-                        dux_prev, duy_prev, duz_prev = unique_displacements[nr_u]
-                        unique_displacements[nr_u] = (dux_prev + ux, duy_prev + uy, duz_prev + uz)
-                    else:
-                        unique_displacements[nr_u] = (ux, uy, uz)
+            # Join displacements onto the indexed nodes, summing repeated node numbers
+            if offsets is None:
+                computed = np.column_stack(
+                    [self.node_index.scatter_add(self.nr_u, u) for u in (self.ux, self.uy, self.uz)])
+            else:
+                computed = offsets
+            previous = self.displacement
+            if self.relaxation_policy is not None:
+                self.displacement = self.relaxation_policy.relax(self.displacement, computed)
+            else:
+                self.displacement = computed
+            if not np.all(np.isfinite(self.displacement)) or not np.all(np.isfinite(self.ux)):
+                # Diverged: keep the last finite coordinates in the .dat file
+                print(f"Divergence: non-finite displacements after {self.iterations} iterations.")
+                return False
+            if self.graph is not None:
+                moving = np.linalg.norm(self.displacement - previous, axis=1) > epsilon
+                parts = len(np.unique(self.graph.components()[moving]))
+                print(f"{np.count_nonzero(moving)} node(s) in {parts} part(s) still moving, "
+                      f"{np.count_nonzero(self.graph.expand(moving))} with their neighbours.")
+            new_xyz = self.nodes.update(self.displacement)
 
             # Update node coordinates
-            for node in unique_positions:
-                x, y, z = unique_positions[node]
-                dux, duy, duz = unique_displacements.get(node, (0.0, 0.0, 0.0))
-
-                new_x = str(x + dux)
-                new_y = str(y + duy)
-                new_z = str(z + duz)
-
-                DAT_interaction.modify_coord(str(node), new_x, new_y, new_z)
-
-            # Perform calculations with the new displacement
-            iterate = SofiFileHandler()
-            iterate.add_sps(self.sofistik_path)  # Setting the SOFiSTiK path here as well
-            iterate.add_cdb(self.cdb_file_path)
-            iterate.add_dat(self.dat_file)
-            iterate.calculate_with_sps()
+            self.write_coordinates(new_xyz)
 
             # Calculate the new delta_u (difference between the old and new ux values)
             delta_ux = abs(max(self.ux) - max(ux_prev))
             print(max(self.ux))
             print(delta_ux)
+            if self.history is not None:
+                self.history.append({'pass': self.iterations, 'delta_ux': float(delta_ux)},
+                                    xyz=new_xyz, displacement=self.displacement)
+
+            # The last run hardly moved the nodes: converged without running the solver again
+            if increments is not None and increments[0] <= self.increment_tolerance and (
+                    self.residual_tolerance is None or increments[1] <= self.residual_tolerance):
+                print(f"Increment {increments[0]:.3g}, residual {increments[1]:.3g}, convergence achieved.")
+                break
+
+            # Perform calculations with the new displacement
+            self.calculate()
 
             # Check for convergence
-            if delta_ux < self.epsilon:
+            if delta_ux < epsilon:
                 print("Convergence achieved.")
-                break
\ No newline at end of file
+                break
+            if delta_n is not None and delta_n <= self.cable_tolerance:
+                print(f"Cable forces stable (relative change {delta_n:.3g}), convergence achieved.")
+                break
+        return True
+
+    def read_coordinate_offsets(self, cdb):
+        """
+        Reads the coordinate offsets of LC 2 + LC 3 (CN_DISPT) as displacements in node index order.
+        On the first call they are compared with the CN_DISP displacements joined as usual, and
+        coordinate_offsets is switched off when they differ or are missing.
+
+        :param cdb: Open CDBinteract.
+        :return: Displacements (n x 3), None to use CN_DISP.
+        """
+        fields = ('m_ux', 'm_uy', 'm_uz')
+        offsets = [cdb.get_coordinate_offsets(lc) for lc in (2, 3)]
+        if not any(len(offset) for offset in offsets):
+            print("No coordinate offsets in the CDB, displacements read from CN_DISP.")
+            self.coordinate_offsets = False
+            return None
+
+        displacement = np.zeros((len(self.node_index), 3))
+        for offset in offsets:
+            if np.array_equal(offset['m_nr'], self.node_index.nr):
+                # Same node order as the index (the usual case): add the columns as they are
+                for axis, field in enumerate(fields):
+                    displacement[:, axis] += offset[field]
+            else:
+                for axis, field in enumerate(fields):
+                    displacement[:, axis] += self.node_index.scatter_add(offset['m_nr'], offset[field])
+
+        if not self.offsets_validated:
+            nr_u, ux, uy, uz = cdb.get_u()
+            expected = np.column_stack([self.node_index.scatter_add(nr_u, u) for u in (ux, uy, uz)])
+            difference = np.max(np.abs(displacement - expected)) if len(expected) else 0.0
+            if difference > 1e-6 * max(1.0, np.max(np.abs(expected))):
+                print(f"Coordinate offsets differ from the displacements by {difference:.3g}, "
+                      f"displacements read from CN_DISP.")
+                self.coordinate_offsets = False
+                return None
+            print("Coordinate offsets match the displacements, CN_DISP no longer read.")
+            self.offsets_validated = True
+        return displacement
+
+    def read_increments(self, cdb):
+        """
+        Reads the displacement increments and residual forces of the last solver run (LC 2 + LC 3).
+
+        :param cdb: Open CDBinteract.
+        :return: (largest increment, largest residual force) over the nodes, None when the CDB
+                 holds no increments (e.g. linear analysis).
+        """
+        increments = [cdb.get_increments(lc) for lc in (2, 3)]
+        if not any(len(increment) for increment in increments):
+            print("No displacement increments in the CDB, convergence checked on the displacements.")
+            return None
+
+        def largest(fields):
+            total = np.column_stack([sum(self.node_index.scatter_add(increment['m_nr'], increment[field])
+                                         for increment in increments) for field in fields])
+            return float(np.max(np.linalg.norm(total, axis=1))) if len(total) else 0.0
+
+        return largest(('m_ux', 'm_uy', 'm_uz')), largest(('m_px', 'm_py', 'm_pz'))
+
+    def read_cable_forces(self, cdb):
+        """
+        Reads the cable normal forces (LC 2 + LC 3, in cable number order) into cable_forces.
+
+        :param cdb: Open CDBinteract.
+        :return: Largest force change since the previous pass relative to the largest force (inf on
+                 the first pass), None when the model has no cables.
+        """
+        cables = [cdb.get_cable_results(lc) for lc in (2, 3)]
+        if self.cable_index is None:
+            self.cable_index = NodeIndex(np.concatenate([cable['m_nr'] for cable in cables]))
+            if len(self.cable_index) == 0:
+                print("No cable results found, cable forces not used for convergence.")
+        if len(self.cable_index) == 0:
+            return None
+
+        forces = sum(self.cable_index.scatter_add(cable['m_nr'], cable['m_n']) for cable in cables)
+        previous, self.cable_forces = self.cable_forces, forces
+        if previous is None:
+            return np.inf
+        return np.max(np.abs(forces - previous)) / max(np.max(np.abs(forces)), 1e-12)
+
+    def write_coordinates(self, xyz):
+        """
+        Writes node coordinates (n x 3, in node index order) to the .dat file.
+        """
+        self.template.update(nr=self.node_index.nr, xyz=xyz)
+        self.template.write(self.dat_file)
+        if self.grid is not None:
+            self.grid.update(xyz)
+        print(f"Coordinates of {len(xyz)} nodes written to '{self.dat_file}'.")
+
+    def apply_loads(self, fraction):
+        """
+        Writes the given fraction of V and H on the load lines of the .dat file.
+        """
+        self.template.update(values={'V': self.V * fraction, 'H': self.H * fraction})
+        self.template.write(self.dat_file)
+        print(f"Loads V={self.V * fraction}, H={self.H * fraction} written to '{self.dat_file}'.")
+
+    def loop_load_stepping(self):
+        """
+        Ramps V and H up to their full value in adaptive increments. Intermediate steps converge
+        with loose_epsilon within max_step_iterations passes, the last one with epsilon within
+        max_final_iterations. The increment grows after steps needing at most fast_iterations
+        passes and shrinks, not below min_load_step, after steps needing slow_iterations or more
+        and more passes than the step before. A step not converging is retried from the last
+        converged state with half the increment. When the increment would fall below
+        min_load_step, or a step fails after slow ones (the iteration contracts slowly whatever the
+        increment), the full load is applied from the last converged state, as loop would do.
+
+        :return: True when the full load converged.
+        """
+        loose_epsilon = self.loose_epsilon if self.loose_epsilon is not None else 10 * self.epsilon
+        fraction = 0.0
+        step = self.initial_load_step
+        converged_state = (self.nodes.snapshot(), self.displacement.copy(), self.ux.copy())
+        previous_iterations = None
+        full_load = False
+
+        while fraction < 1.0:
+            target = min(1.0, fraction + step)
+            final = target >= 1.0
+            print(f"Load step to {target:.4g} x (V, H), increment {step:.4g}")
+            self.apply_loads(target)
+            self.calculate()
+
+            if self.converge(self.epsilon if final else loose_epsilon,
+                             self.max_final_iterations if final else self.max_step_iterations):
+                fraction = target
+                converged_state = (self.nodes.snapshot(), self.displacement.copy(), self.ux.copy())
+                if self.iterations <= self.fast_iterations:
+                    step *= 2
+                elif self.iterations >= self.slow_iterations and (
+                        previous_iterations is None or self.iterations > previous_iterations):
+                    step = max(step / 2, self.min_load_step)
+                previous_iterations = self.iterations
+            else:
+                # Go back to the last converged geometry and retry with a smaller increment
+                step /= 2
+                self.nodes.restore(converged_state[0])
+                self.displacement, self.ux = converged_state[1].copy(), converged_state[2].copy()
+                self.write_coordinates(self.nodes.xyz)
+                if full_load:
+                    print(f"Load stepping stopped: no convergence under the full load from {fraction:.4g} x (V, H).")
+                    return False
+                slow = previous_iterations is not None and previous_iterations >= self.slow_iterations
+                if slow or step < self.min_load_step:
+                    print(f"Full load applied from {fraction:.4g} x (V, H).")
+                    full_load = True
+                    step = 1.0 - fraction
+
+        print("Load stepping completed.")
+        return True
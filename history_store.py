@@ -0,0 +1,222 @@
+import os
+import json
+import zlib
+import struct
+import numpy as np
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+HISTORY_MAGIC = b'BITHIST1'
+# Magic, quantum, codec, keyframe interval
+FILE_HEADER = struct.Struct('<8sd4sI')
+# Metadata length, payload length
+RECORD_HEADER = struct.Struct('<IQ')
+
+
+class IterationHistory:
+    def __init__(self, path, quantum=1e-9, codec=None, keyframe_interval=16):
+        """
+        Append-only history of the iteration states (coordinates, displacements...) in one file.
+        Arrays are quantised to integer multiples of quantum and every record stores the difference
+        to the previous one, in the smallest integer type holding it, byte-shuffled (all first bytes,
+        then all second bytes...) and compressed. Every
+        keyframe_interval records the full state is stored, so any record is rebuilt from at most
+        keyframe_interval records. Since the differences are taken between quantised values, the
+        rebuilt arrays differ from the stored ones by at most quantum / 2, without drift.
+
+        An existing file is opened for reading and appending, with its own quantum and codec.
+
+        :param path: History file.
+        :param quantum: Resolution of the stored values.
+        :param codec: 'zstd' or 'zlib' (None: zstd when the zstandard package is installed).
+        :param keyframe_interval: Records between two full states.
+        """
+        self.path = os.path.abspath(os.path.normpath(path))
+        # Offset, metadata of every record
+        self.index = []
+        # Last rebuilt record and its quantised arrays, for sequential reads and appends
+        self.cached = None
+        self.last = None
+
+        if os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            self.scan()
+            return
+
+        if codec is None:
+            codec = 'zstd' if zstandard is not None else 'zlib'
+        if codec not in ('zstd', 'zlib'):
+            raise ValueError(f"Unknown codec '{codec}'.")
+        if codec == 'zstd' and zstandard is None:
+            raise ImportError("The zstandard package is needed for the zstd codec.")
+        self.quantum = float(quantum)
+        self.codec = codec
+        self.keyframe_interval = int(keyframe_interval)
+        with open(self.path, 'wb') as file:
+            file.write(FILE_HEADER.pack(HISTORY_MAGIC, self.quantum, self.codec.encode('ascii'),
+                                        self.keyframe_interval))
+
+    def scan(self):
+        """
+        Reads the file header and the record index of an existing history.
+        """
+        end = os.path.getsize(self.path)
+        with open(self.path, 'rb') as file:
+            magic, quantum, codec, interval = FILE_HEADER.unpack(file.read(FILE_HEADER.size))
+            if magic != HISTORY_MAGIC:
+                raise ValueError(f"'{self.path}' is not an iteration history.")
+            self.quantum = quantum
+            self.codec = codec.decode('ascii')
+            self.keyframe_interval = interval
+            offset = file.tell()
+            while offset + RECORD_HEADER.size <= end:
+                meta_length, payload_length = RECORD_HEADER.unpack(file.read(RECORD_HEADER.size))
+                if offset + RECORD_HEADER.size + meta_length + payload_length > end:
+                    break
+                self.index.append((offset, json.loads(file.read(meta_length))))
+                offset = file.seek(payload_length, os.SEEK_CUR)
+        if offset < end:
+            # Drop a record cut by an interrupted write, so appends start on a record boundary
+            print(f"Incomplete last record of '{self.path}' removed.")
+            with open(self.path, 'r+b') as file:
+                file.truncate(offset)
+        if self.codec == 'zstd' and zstandard is None:
+            raise ImportError("The zstandard package is needed to read this history.")
+
+    def __len__(self):
+        return len(self.index)
+
+    def compress(self, data):
+        if self.codec == 'zstd':
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return zlib.compress(data, 1)
+
+    def decompress(self, data):
+        if self.codec == 'zstd':
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    def quantise(self, values):
+        return np.round(np.asarray(values, dtype=np.float64) / self.quantum).astype(np.int64)
+
+    def append(self, info=None, **arrays):
+        """
+        Stores the next state.
+
+        :param info: Dict of JSON values kept with the record (pass number, delta_ux, load fraction...).
+        :param arrays: Named arrays of the state, e.g. xyz=..., displacement=...
+        :return: Index of the record.
+        """
+        quantised = {name: self.quantise(values) for name, values in arrays.items()}
+        if self.last is None and self.index:
+            self.last = self.read_quantised(len(self.index) - 1)
+        layout = [[name, list(values.shape)] for name, values in quantised.items()]
+        keyframe = (len(self.index) % self.keyframe_interval == 0 or self.last is None
+                    or layout != [[name, list(values.shape)] for name, values in self.last.items()])
+
+        if keyframe:
+            deltas = [values.ravel() for values in quantised.values()]
+        else:
+            deltas = [(values - self.last[name]).ravel() for name, values in quantised.items()]
+        deltas = np.concatenate(deltas) if deltas else np.zeros(0, dtype=np.int64)
+        itemsize = smallest_itemsize(deltas)
+        shuffled = deltas.astype(f'<i{itemsize}').view(np.uint8).reshape(-1, itemsize).T
+        payload = self.compress(shuffled.tobytes())
+        meta = json.dumps({'keyframe': keyframe, 'itemsize': itemsize, 'arrays': layout,
+                           'info': info or {}}).encode('utf8')
+
+        with open(self.path, 'ab') as file:
+            offset = file.tell()
+            file.write(RECORD_HEADER.pack(len(meta), len(payload)))
+            file.write(meta)
+            file.write(payload)
+        self.index.append((offset, json.loads(meta)))
+        self.last = quantised
+        return len(self.index) - 1
+
+    def read_deltas(self, file, i):
+        offset, meta = self.index[i]
+        file.seek(offset)
+        meta_length, payload_length = RECORD_HEADER.unpack(file.read(RECORD_HEADER.size))
+        file.seek(meta_length, os.SEEK_CUR)
+        itemsize = meta['itemsize']
+        shuffled = np.frombuffer(self.decompress(file.read(payload_length)), dtype=np.uint8)
+        data = np.ascontiguousarray(shuffled.reshape(itemsize, -1).T)
+        return data.view(f"<i{itemsize}").ravel().astype(np.int64)
+
+    def read_quantised(self, i):
+        """
+        Rebuilds the quantised arrays of record i from its last keyframe.
+        """
+        if i < 0:
+            i += len(self.index)
+        if not 0 <= i < len(self.index):
+            raise IndexError(f"No record {i} in the history ({len(self.index)} records).")
+        if self.cached is not None and self.cached[0] == i:
+            return self.cached[1]
+
+        # Continue from the cached record when it lies between the keyframe and i
+        start = next(k for k in range(i, -1, -1) if self.index[k][1]['keyframe'])
+        state = None
+        if self.cached is not None and start <= self.cached[0] < i:
+            start, state = self.cached[0] + 1, {name: values.ravel().copy() for name, values in self.cached[1].items()}
+
+        with open(self.path, 'rb') as file:
+            for k in range(start, i + 1):
+                deltas = self.read_deltas(file, k)
+                layout = self.index[k][1]['arrays']
+                sizes = [int(np.prod(shape)) for _, shape in layout]
+                pieces = np.split(deltas, np.cumsum(sizes)[:-1]) if layout else []
+                if self.index[k][1]['keyframe']:
+                    state = {name: piece.copy() for (name, _), piece in zip(layout, pieces)}
+                else:
+                    for (name, _), piece in zip(layout, pieces):
+                        state[name] += piece
+
+        state = {name: values.reshape(shape) for (name, shape), values in
+                 zip(self.index[i][1]['arrays'], state.values())}
+        self.cached = (i, state)
+        return state
+
+    def __getitem__(self, i):
+        """
+        Returns the arrays of record i (float64) as a dict.
+        """
+        return {name: values * self.quantum for name, values in self.read_quantised(i).items()}
+
+    def info(self, i):
+        return self.index[i][1]['info']
+
+    def __iter__(self):
+        for i in range(len(self.index)):
+            yield self[i]
+
+    def diff(self, i, j, name):
+        """
+        Compares one array between two records.
+
+        :return: (difference j - i, maximum absolute difference, row of the maximum)
+        """
+        difference = (self.read_quantised(j)[name] - self.read_quantised(i)[name]) * self.quantum
+        if difference.size == 0:
+            return difference, 0.0, None
+        magnitude = np.abs(difference).reshape(len(difference), -1).max(axis=1)
+        row = int(np.argmax(magnitude))
+        return difference, float(magnitude[row]), row
+
+
+def smallest_itemsize(values):
+    """
+    Returns the size in bytes of the smallest signed integer type holding all values.
+    """
+    if values.size == 0:
+        return 1
+    low, high = int(values.min()), int(values.max())
+    for itemsize in (1, 2, 4):
+        limit = 2 ** (8 * itemsize - 1)
+        if -limit <= low and high < limit:
+            return itemsize
+    return 8
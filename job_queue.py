@@ -0,0 +1,231 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import tempfile
+import threading
+import subprocess
+
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+DEFAULT_QUEUE_PATH = os.path.join(tempfile.gettempdir(), 'beamiter_solver_queue.sqlite')
+
+
+class SolverQueue:
+    def __init__(self, db_path=DEFAULT_QUEUE_PATH, max_concurrency=None, poll_interval=0.5, lease_timeout=30.0):
+        """
+        Persistent solver job queue shared by every process of a host through a SQLite file.
+        At most max_concurrency jobs run at once on a host, so GUI windows and scripts started
+        side by side do not take more SOFiSTiK licences than available.
+
+        :param db_path: Path to the SQLite queue file.
+        :param max_concurrency: Concurrent jobs allowed on this host, stored in the queue
+                                (None: keep the stored value, 1 if never set).
+        :param poll_interval: Seconds between two checks for a free slot or a cancellation.
+        :param lease_timeout: Seconds without heartbeat after which a job is considered abandoned: a
+                              running one failed, a queued one (its submitter stopped waiting)
+                              cancelled.
+        """
+        self.db_path = os.path.abspath(os.path.normpath(db_path))
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.host = socket.gethostname()
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+
+        with self.connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                host TEXT NOT NULL,
+                command TEXT NOT NULL,
+                cwd TEXT,
+                priority INTEGER NOT NULL DEFAULT 0,
+                state TEXT NOT NULL,
+                pid INTEGER,
+                returncode INTEGER,
+                submitted REAL,
+                started REAL,
+                finished REAL,
+                heartbeat REAL)""")
+            conn.execute("CREATE TABLE IF NOT EXISTS hosts (host TEXT PRIMARY KEY, max_concurrency INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO hosts VALUES (?, 1)", (self.host,))
+        if max_concurrency is not None:
+            self.set_max_concurrency(max_concurrency)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return Transaction(conn)
+
+    def set_max_concurrency(self, max_concurrency):
+        """
+        Sets the number of jobs allowed to run at once on this host.
+        """
+        with self.connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO hosts VALUES (?, ?)", (self.host, int(max_concurrency)))
+
+    def max_concurrency(self):
+        with self.connect() as conn:
+            return conn.execute("SELECT max_concurrency FROM hosts WHERE host = ?", (self.host,)).fetchone()[0]
+
+    def submit(self, command, priority=0, cwd=None):
+        """
+        Queues a command.
+
+        :param command: Command as a list of arguments, e.g. [sps_exe, dat_file].
+        :param priority: Jobs with a higher priority start first, equal priorities in submission order.
+        :param cwd: Working directory of the command.
+        :return: Job id.
+        """
+        with self.connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO jobs (host, command, cwd, priority, state, submitted, heartbeat) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.host, json.dumps(list(command)), cwd, priority, QUEUED, time.time(), time.time()))
+            return cursor.lastrowid
+
+    def status(self, job_id):
+        """
+        Returns the job as a dict (state, priority, returncode, timestamps...), None for an unknown id.
+        """
+        with self.connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def cancel(self, job_id):
+        """
+        Cancels a queued job, or terminates it if it is running.
+
+        :return: True if the job was still queued or running.
+        """
+        with self.connect() as conn:
+            cursor = conn.execute("UPDATE jobs SET state = ?, finished = ? WHERE id = ? AND state IN (?, ?)",
+                                  (CANCELLED, time.time(), job_id, QUEUED, RUNNING))
+            return cursor.rowcount > 0
+
+    def claim(self, job_id):
+        """
+        Marks the job as running if it is among the next jobs allowed to start on this host.
+        Every attempt is also the heartbeat of the waiting job.
+
+        :return: The job state after the attempt.
+        """
+        with self.connect() as conn:
+            # Taken once the transaction holds the lock, so started follows the finish of the job freeing the slot
+            now = time.time()
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ? AND state = ?", (now, job_id, QUEUED))
+            # Jobs of processes that stopped sending heartbeats free their slot or their place in the queue
+            expired = now - self.lease_timeout
+            conn.execute("UPDATE jobs SET state = ?, finished = ? WHERE host = ? AND state = ? AND heartbeat < ?",
+                         (FAILED, now, self.host, RUNNING, expired))
+            conn.execute("UPDATE jobs SET state = ?, finished = ? WHERE host = ? AND state = ? "
+                         "AND COALESCE(heartbeat, submitted) < ?", (CANCELLED, now, self.host, QUEUED, expired))
+            state = conn.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+            if state != QUEUED:
+                return state
+
+            limit = conn.execute("SELECT max_concurrency FROM hosts WHERE host = ?", (self.host,)).fetchone()[0]
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE host = ? AND state = ?",
+                                   (self.host, RUNNING)).fetchone()[0]
+            free = limit - running
+            if free <= 0:
+                return state
+            next_jobs = [row[0] for row in conn.execute(
+                "SELECT id FROM jobs WHERE host = ? AND state = ? ORDER BY priority DESC, id LIMIT ?",
+                (self.host, QUEUED, free))]
+            if job_id not in next_jobs:
+                return state
+            conn.execute("UPDATE jobs SET state = ?, pid = ?, started = ?, heartbeat = ? WHERE id = ?",
+                         (RUNNING, os.getpid(), now, now, job_id))
+            return RUNNING
+
+    def run(self, job_id):
+        """
+        Waits for a free slot, runs the job and records its result.
+
+        :return: subprocess.CompletedProcess, or None if the job was cancelled before it started.
+        """
+        process = None
+        try:
+            while True:
+                state = self.claim(job_id)
+                if state == RUNNING:
+                    break
+                if state != QUEUED:
+                    print(f"Solver job {job_id} not started, state: {state}.")
+                    return None
+                time.sleep(self.poll_interval)
+
+            job = self.status(job_id)
+            command = json.loads(job['command'])
+            try:
+                process = subprocess.Popen(
+                    command,
+                    cwd=job['cwd'],
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+                )
+            except Exception:
+                # Free the slot before reporting the error
+                with self.connect() as conn:
+                    conn.execute("UPDATE jobs SET state = ?, finished = ? WHERE id = ?", (FAILED, time.time(), job_id))
+                raise
+
+            # Read the pipes in the background while the heartbeat and cancellation are handled here
+            output = {}
+            reader = threading.Thread(target=lambda: output.update(zip(('stdout', 'stderr'), process.communicate())))
+            reader.start()
+            cancelled = False
+            while reader.is_alive():
+                reader.join(self.poll_interval)
+                with self.connect() as conn:
+                    conn.execute("UPDATE jobs SET heartbeat = ? WHERE id = ?", (time.time(), job_id))
+                    state = conn.execute("SELECT state FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+                if state == CANCELLED and not cancelled:
+                    print(f"Solver job {job_id} cancelled, terminating process {process.pid}.")
+                    process.terminate()
+                    cancelled = True
+
+            with self.connect() as conn:
+                conn.execute("UPDATE jobs SET state = ?, returncode = ?, finished = ? WHERE id = ? AND state = ?",
+                             (DONE if process.returncode == 0 else FAILED, process.returncode, time.time(),
+                              job_id, RUNNING))
+            return subprocess.CompletedProcess(command, process.returncode, output.get('stdout'), output.get('stderr'))
+        finally:
+            # Interrupted (Ctrl-C, closed window...): free the slot or the place in the queue
+            if process is not None and process.poll() is None:
+                process.terminate()
+            with self.connect() as conn:
+                conn.execute("UPDATE jobs SET state = ?, finished = ? WHERE id = ? AND state IN (?, ?)",
+                             (CANCELLED, time.time(), job_id, QUEUED, RUNNING))
+
+    def execute(self, command, priority=0, cwd=None):
+        """
+        Submits a command and runs it once a slot is free (blocking).
+        """
+        return self.run(self.submit(command, priority, cwd))
+
+
+class Transaction:
+    """
+    Runs the statements of a with-block in one immediate SQLite transaction and closes the connection.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self.conn.close()
@@ -0,0 +1,59 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PipelinedExecutor:
+    def __init__(self, iteration_factory, workers=2, solver_slots=1):
+        """
+        Runs several Iteration cases side by side in a thread pool. Solver runs are limited to
+        solver_slots at a time, so while one case waits for the solver another reads its CDB, joins
+        the results and renders its next .dat file. sps.exe runs in its own process and the CDB DLL
+        is called through ctypes, both release the GIL. The DLL is shared by the whole process, so
+        DLLBackend serializes its calls and every case's session closes only its own CDB index.
+
+        :param iteration_factory: Callable (case) returning an Iteration, e.g. a (V, H) tuple.
+        :param workers: Number of cases in flight.
+        :param solver_slots: Concurrent solver runs (licences / cores available).
+        """
+        self.iteration_factory = iteration_factory
+        self.workers = workers
+        self.solver_slots = solver_slots
+        self.report = None
+
+    def run_case(self, case, slots):
+        start = time.perf_counter()
+        iteration = self.iteration_factory(case)
+        iteration.solver_slots = slots
+        iteration.initialize()
+        iteration.converged = iteration.loop()
+        iteration.duration = time.perf_counter() - start
+        return iteration
+
+    def run(self, cases):
+        """
+        Iterates all cases and reports how much of the work was overlapped.
+
+        :param cases: Iterable of cases passed to iteration_factory.
+        :return: List of the finished Iteration objects, in case order.
+        """
+        slots = threading.Semaphore(self.solver_slots)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            iterations = list(pool.map(lambda case: self.run_case(case, slots), cases))
+        wall = time.perf_counter() - start
+
+        solver = sum(iteration.solver_time for iteration in iterations)
+        # Work outside the solver: CDB reads, joins, .dat rendering
+        other = sum(iteration.duration - iteration.solver_time - iteration.solver_wait_time
+                    for iteration in iterations)
+        serial = solver + other
+        # Best case: the solver slots never idle, or all workers always busy
+        ideal = max(solver / self.solver_slots, serial / self.workers)
+        efficiency = (serial - wall) / (serial - ideal) if serial > ideal else 0.0
+        self.report = {'cases': len(iterations), 'wall': wall, 'solver': solver, 'other': other,
+                       'serial': serial, 'ideal': ideal, 'overlap_efficiency': max(0.0, min(1.0, efficiency))}
+        print(f"Pipelined {len(iterations)} cases in {wall:.2f} s (serial estimate {serial:.2f} s, "
+              f"solver {solver:.2f} s, other {other:.2f} s), overlap efficiency "
+              f"{self.report['overlap_efficiency']:.0%}.")
+        return iterations
@@ -0,0 +1,102 @@
+import os
+import re
+import glob
+import hashlib
+import numpy as np
+
+
+class SolutionStore:
+    def __init__(self, directory):
+        """
+        Persistent store of converged displacement fields, keyed by model hash and loads (V, H).
+
+        :param directory: Directory holding one .npz file per converged solution.
+        """
+        self.directory = os.path.abspath(os.path.normpath(directory))
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def model_hash(dat_file, nr, xyz):
+        """
+        Hashes the model independently of the node coordinates and nodal loads written by Iteration.
+
+        :param dat_file: Path to the .dat file.
+        :param nr: Sorted node numbers.
+        :param xyz: Undeformed coordinates (n x 3) in the order of nr.
+        """
+        digest = hashlib.sha1()
+        with open(dat_file, 'r') as file:
+            for line in file:
+                # NODE lines hold the iterated coordinates and the V/H loads
+                if not re.match(r'\s*NODE\s', line, re.IGNORECASE):
+                    digest.update(line.encode('utf8'))
+        digest.update(np.asarray(nr, dtype=np.int64).tobytes())
+        digest.update(np.round(np.asarray(xyz, dtype=float), 6).tobytes())
+        return digest.hexdigest()[:16]
+
+    def save(self, model_hash, V, H, nr, displacement):
+        """
+        Stores a converged displacement field.
+
+        :param model_hash: Hash returned by model_hash.
+        :param V: Vertical load of the solution.
+        :param H: Horizontal load of the solution.
+        :param nr: Sorted node numbers.
+        :param displacement: Displacements (n x 3) in the order of nr.
+        """
+        path = os.path.join(self.directory, f"{model_hash}_{V:.6g}_{H:.6g}.npz")
+        np.savez(path, V=V, H=H, nr=np.asarray(nr), displacement=np.asarray(displacement, dtype=float))
+        print(f"Converged solution for V={V}, H={H} stored in '{path}'.")
+
+    def solutions(self, model_hash):
+        """
+        Returns the (V, H, path) of every solution stored for a model.
+        """
+        found = []
+        for path in glob.glob(os.path.join(self.directory, f"{model_hash}_*.npz")):
+            with np.load(path) as data:
+                found.append((float(data['V']), float(data['H']), path))
+        return found
+
+    def lookup(self, model_hash, V, H, neighbours=4):
+        """
+        Estimates the displacement field for (V, H) from the nearest stored solutions.
+
+        An exact match is returned as is. Otherwise a displacement field linear in V and H is
+        fitted through the nearest solutions, falling back to inverse distance weighting when they
+        do not span the (V, H) plane.
+
+        :param model_hash: Hash returned by model_hash.
+        :param V: Vertical load of the new run.
+        :param H: Horizontal load of the new run.
+        :param neighbours: Maximum number of solutions used.
+        :return: (nr, displacement) or None when nothing is stored for the model.
+        """
+        found = self.solutions(model_hash)
+        if not found:
+            return None
+
+        distances = np.array([np.hypot(v - V, h - H) for v, h, _ in found])
+        nearest = np.argsort(distances)[:neighbours]
+        if distances[nearest[0]] == 0:
+            nearest = nearest[:1]
+
+        nr = None
+        fields = []
+        for i in nearest:
+            with np.load(found[i][2]) as data:
+                nr = data['nr']
+                fields.append(data['displacement'])
+        fields = np.array(fields)
+
+        loads = np.array([[1.0, found[i][0], found[i][1]] for i in nearest])
+        if len(nearest) >= 3 and np.linalg.matrix_rank(loads) == 3:
+            coefficients = np.linalg.lstsq(loads, fields.reshape(len(nearest), -1), rcond=None)[0]
+            displacement = (np.array([1.0, V, H]) @ coefficients).reshape(fields.shape[1:])
+        elif len(nearest) == 1:
+            displacement = fields[0]
+        else:
+            weights = 1.0 / distances[nearest]
+            displacement = np.tensordot(weights / weights.sum(), fields, axes=1)
+        print(f"Warm start from {len(nearest)} stored solution(s), nearest at distance {distances[nearest[0]]:.6g}.")
+        return nr, displacement
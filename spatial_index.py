@@ -0,0 +1,180 @@
+import math
+import numpy as np
+
+
+# Cells per axis at most, so the linear cell keys of three axes fit in int64
+MAX_CELLS = 2 ** 20
+
+
+class NodeGrid:
+    def __init__(self, nr, xyz, nodes_per_cell=2.0):
+        """
+        Uniform grid over node coordinates for nearest-node and box queries. The nodes are sorted
+        by cell, so the nodes of a cell are one slice of order and a query only reads the cells it
+        touches. The cell size gives about nodes_per_cell nodes per cell over the axes the model
+        extends along (a plane or a line gets a single cell layer across), refined when the nodes
+        lie on a surface or line inside that box and crowd fewer cells. The grid has a margin of
+        one cell around the bounding box; moving a node only re-sorts it when it changes cell, and
+        the grid is rebuilt when a node leaves it.
+
+        :param nr: Node numbers (NodeIndex.nr).
+        :param xyz: Coordinates (n x 3) in the order of nr.
+        :param nodes_per_cell: Mean number of nodes per cell.
+        """
+        self.nr = np.asarray(nr, dtype=np.int64)
+        self.xyz = np.array(xyz, dtype=np.float64).reshape(-1, 3)
+        self.nodes_per_cell = nodes_per_cell
+        self.rebuilds = 0
+        self.build()
+
+    def build(self):
+        """
+        Sizes the grid on the current coordinates and sorts the nodes by cell.
+        """
+        lower = self.xyz.min(axis=0) if len(self.xyz) else np.zeros(3)
+        extent = self.xyz.max(axis=0) - lower if len(self.xyz) else np.zeros(3)
+        active = extent > 0
+        if np.any(active):
+            volume = np.prod(extent[active]) * self.nodes_per_cell / len(self.xyz)
+            self.cell = volume ** (1.0 / np.count_nonzero(active))
+        else:
+            self.cell = 1.0
+        smallest = extent.max() / (MAX_CELLS - 3)
+        while True:
+            self.cell = max(self.cell, smallest)
+            self.origin = lower - self.cell
+            self.shape = np.floor(extent / self.cell).astype(np.int64) + 3
+            self.keys = self.cell_keys(self.cell_coordinates(self.xyz))
+            self.order = np.argsort(self.keys, kind='stable')
+            self.index_cells()
+            occupancy = len(self.xyz) / max(len(self.cells), 1)
+            # All nodes at one point: a single cell whatever its size
+            if occupancy < 2 * self.nodes_per_cell or self.cell <= smallest or not np.any(active):
+                break
+            # Nodes on a surface: occupancy falls with the square of the cell size
+            self.cell /= np.sqrt(occupancy / self.nodes_per_cell)
+
+    def cell_coordinates(self, xyz):
+        return np.floor((xyz - self.origin) / self.cell).astype(np.int64)
+
+    def cell_keys(self, coordinates):
+        return (coordinates[..., 0] * self.shape[1] + coordinates[..., 1]) * self.shape[2] + coordinates[..., 2]
+
+    def index_cells(self):
+        """
+        Finds the occupied cells and the start of their slice of order.
+        """
+        keys = self.keys[self.order]
+        first = np.flatnonzero(np.append(True, keys[1:] != keys[:-1])) if len(keys) else np.zeros(0, dtype=np.int64)
+        self.cells = keys[first]
+        self.starts = np.append(first, len(keys))
+
+    def update(self, xyz):
+        """
+        Moves the nodes to new coordinates. Nodes staying in their cell cost nothing, the others
+        are taken out of the sorted order and merged back at their new cell.
+
+        :param xyz: Coordinates (n x 3) in the order of nr.
+        :return: Number of nodes that changed cell (all of them after a rebuild).
+        """
+        self.xyz[:] = xyz
+        coordinates = self.cell_coordinates(self.xyz)
+        if np.any(coordinates < 0) or np.any(coordinates >= self.shape):
+            self.rebuilds += 1
+            self.build()
+            return len(self.xyz)
+
+        keys = self.cell_keys(coordinates)
+        moved = np.flatnonzero(keys != self.keys)
+        if len(moved) == 0:
+            return 0
+        self.keys = keys
+        if len(moved) > len(keys) // 8:
+            self.order = np.argsort(keys, kind='stable')
+        else:
+            stays = np.ones(len(keys), dtype=bool)
+            stays[moved] = False
+            kept = self.order[stays[self.order]]
+            moved = moved[np.argsort(keys[moved], kind='stable')]
+            self.order = np.insert(kept, np.searchsorted(keys[kept], keys[moved], side='right'), moved)
+        self.index_cells()
+        return len(moved)
+
+    def rows_in_cells(self, lower, upper):
+        """
+        Returns the rows of the nodes in the block of cells lower..upper (cell coordinates,
+        inclusive).
+        """
+        if len(self.cells) == 0:
+            return np.zeros(0, dtype=np.int64)
+        keys = ((np.arange(lower[0], upper[0] + 1)[:, None, None] * int(self.shape[1])
+                 + np.arange(lower[1], upper[1] + 1)[None, :, None]) * int(self.shape[2])
+                + np.arange(lower[2], upper[2] + 1)[None, None, :]).ravel()
+        pos = np.minimum(np.searchsorted(self.cells, keys), len(self.cells) - 1)
+        pos = pos[self.cells[pos] == keys]
+        lengths = self.starts[pos + 1] - self.starts[pos]
+        offsets = np.repeat(self.starts[pos] - np.cumsum(lengths) + lengths, lengths)
+        return self.order[offsets + np.arange(len(offsets))]
+
+    def box(self, lower, upper):
+        """
+        Returns the numbers of the nodes inside an axis-aligned box (bounds included), sorted.
+
+        :param lower: Minimum x, y, z.
+        :param upper: Maximum x, y, z.
+        """
+        lower = np.asarray(lower, dtype=np.float64)
+        upper = np.asarray(upper, dtype=np.float64)
+        if np.any(lower > upper):
+            return np.zeros(0, dtype=np.int64)
+        low = np.clip(self.cell_coordinates(lower), 0, self.shape - 1)
+        high = np.clip(self.cell_coordinates(upper), 0, self.shape - 1)
+        if np.prod(high - low + 1) > len(self.xyz):
+            # Box larger than the model: testing every node is cheaper than listing the cells
+            rows = np.arange(len(self.xyz))
+        else:
+            rows = self.rows_in_cells(low, high)
+        points = self.xyz[rows]
+        inside = np.all((points >= lower) & (points <= upper), axis=1)
+        return np.sort(self.nr[rows[inside]])
+
+    def nearest(self, point):
+        """
+        Returns the number of the node closest to a point and its distance (None, inf without
+        nodes). The block of cells around the point grows ring by ring until the closest node
+        found is nearer than any cell outside the block.
+
+        :param point: x, y, z.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        if len(self.xyz) == 0:
+            return None, np.inf
+        # Per axis in Python numbers: the blocks are small, numpy calls would dominate
+        origin = self.origin.tolist()
+        last = (self.shape - 1).tolist()
+        centre = [min(max(math.floor((p - o) / self.cell), 0), m) for p, o, m in zip(point.tolist(), origin, last)]
+        best, best_distance = -1, np.inf
+        ring = 0
+        while True:
+            low = [max(c - ring, 0) for c in centre]
+            high = [min(c + ring, m) for c, m in zip(centre, last)]
+            if math.prod(h - l + 1 for l, h in zip(low, high)) > len(self.xyz):
+                rows = np.arange(len(self.xyz))
+                low, high = [0, 0, 0], last
+            else:
+                rows = self.rows_in_cells(low, high)
+            if len(rows):
+                offset = self.xyz[rows] - point
+                distance = np.einsum('ij,ij->i', offset, offset)
+                k = np.argmin(distance)
+                if distance[k] < best_distance:
+                    best, best_distance = rows[k], distance[k]
+
+            # Distance from the point to the cells not searched yet (none beyond the grid edges)
+            reach = min([p - (o + l * self.cell) for p, o, l in zip(point.tolist(), origin, low) if l > 0]
+                        + [o + (h + 1) * self.cell - p for p, o, h, m in zip(point.tolist(), origin, high, last)
+                           if h < m], default=np.inf)
+            if np.isinf(reach) or (best >= 0 and best_distance <= reach ** 2):
+                break
+            ring += 1
+        return int(self.nr[best]), float(np.sqrt(best_distance))
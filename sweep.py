@@ -0,0 +1,303 @@
+"""
+Distributed (V, H) sweeps: cases are queued in a broker directory shared by several hosts, and
+workers on each host with SOFiSTiK installed iterate them and push the converged arrays back.
+
+Usage:
+    python sweep.py submit BROKER_DIR --V 1 2 3 --H 0.5 1 --epsilon 1e-4
+    python sweep.py worker BROKER_DIR MODEL.dat SOFISTIK_PATH
+    python sweep.py status BROKER_DIR
+"""
+import os
+import json
+import time
+import uuid
+import glob
+import shutil
+import socket
+import argparse
+import threading
+import itertools
+import numpy as np
+from flamb import Iteration
+from job_queue import SolverQueue
+
+
+class DirectoryBroker:
+    def __init__(self, root, max_attempts=3, heartbeat_timeout=120.0):
+        """
+        Case broker living in a directory, typically on a network share. Every state change is a
+        rename inside the directory, which is atomic, so concurrent workers never get the same case.
+
+        :param root: Broker directory.
+        :param max_attempts: Attempts per case before it is moved to failed.
+        :param heartbeat_timeout: Seconds without heartbeat after which a claimed case is requeued.
+        """
+        self.root = os.path.abspath(os.path.normpath(root))
+        self.max_attempts = max_attempts
+        self.heartbeat_timeout = heartbeat_timeout
+        for sub in ('pending', 'claimed', 'results', 'failed'):
+            os.makedirs(os.path.join(self.root, sub), exist_ok=True)
+
+    def path(self, sub, name):
+        return os.path.join(self.root, sub, name)
+
+    @staticmethod
+    def case_id(V, H, epsilon):
+        return f"V{V:.6g}_H{H:.6g}_e{epsilon:.3g}"
+
+    def submit(self, cases):
+        """
+        Queues (V, H, epsilon) cases. Cases already queued, running or solved are skipped.
+
+        :return: Ids of the newly queued cases.
+        """
+        queued = []
+        for V, H, epsilon in cases:
+            case_id = self.case_id(V, H, epsilon)
+            if self.known(case_id):
+                continue
+            self.write_json(self.path('pending', case_id + '.json'),
+                            {'id': case_id, 'V': V, 'H': H, 'epsilon': epsilon, 'attempts': 0})
+            queued.append(case_id)
+        print(f"{len(queued)} case(s) queued in '{self.root}'.")
+        return queued
+
+    def known(self, case_id):
+        return (os.path.exists(self.path('pending', case_id + '.json'))
+                or os.path.exists(self.path('results', case_id + '.npz'))
+                or os.path.exists(self.path('failed', case_id + '.json'))
+                or bool(glob.glob(self.path('claimed', case_id + '.*.json'))))
+
+    def claim(self, worker_id):
+        """
+        Takes the next pending case for a worker.
+
+        :return: Case dict, or None when nothing is pending.
+        """
+        self.requeue_stale()
+        for pending in sorted(glob.glob(self.path('pending', '*.json'))):
+            case_id = os.path.basename(pending)[:-len('.json')]
+            claimed = self.path('claimed', f"{case_id}.{worker_id}.json")
+            try:
+                os.rename(pending, claimed)
+            except OSError:
+                # Another worker was faster
+                continue
+            os.utime(claimed)
+            return self.read_json(claimed)
+        return None
+
+    def heartbeat(self, case_id, worker_id):
+        """
+        Marks a claimed case as still being worked on.
+        """
+        try:
+            os.utime(self.path('claimed', f"{case_id}.{worker_id}.json"))
+        except OSError:
+            pass
+
+    def complete(self, case_id, worker_id, **arrays):
+        """
+        Stores the result arrays of a case. A result already stored by another worker (after a
+        requeue) is kept and the duplicate discarded.
+        """
+        result = self.path('results', case_id + '.npz')
+        if os.path.exists(result):
+            print(f"Duplicate result for case {case_id} from {worker_id} discarded.")
+        else:
+            temporary = self.path('results', f".{case_id}.{worker_id}.npz")
+            np.savez(temporary, **arrays)
+            os.replace(temporary, result)
+        self.release(case_id, worker_id)
+
+    def fail(self, case_id, worker_id, error):
+        """
+        Records a failed attempt. The case is queued again until max_attempts is reached.
+        """
+        claimed = self.path('claimed', f"{case_id}.{worker_id}.json")
+        try:
+            case = self.read_json(claimed)
+        except OSError:
+            return
+        case['attempts'] += 1
+        case['error'] = str(error)
+        target = 'pending' if case['attempts'] < self.max_attempts else 'failed'
+        self.write_json(self.path(target, case_id + '.json'), case)
+        self.release(case_id, worker_id)
+        print(f"Case {case_id} failed on {worker_id} (attempt {case['attempts']}): {error}")
+
+    def release(self, case_id, worker_id):
+        try:
+            os.remove(self.path('claimed', f"{case_id}.{worker_id}.json"))
+        except OSError:
+            pass
+
+    def requeue_stale(self):
+        """
+        Moves claimed cases whose worker stopped sending heartbeats back to pending.
+        """
+        now = time.time()
+        for claimed in glob.glob(self.path('claimed', '*.json')):
+            try:
+                if now - os.path.getmtime(claimed) < self.heartbeat_timeout:
+                    continue
+                case = self.read_json(claimed)
+                os.remove(claimed)
+            except OSError:
+                continue
+            if os.path.exists(self.path('results', case['id'] + '.npz')):
+                continue
+            case['attempts'] += 1
+            target = 'pending' if case['attempts'] < self.max_attempts else 'failed'
+            self.write_json(self.path(target, case['id'] + '.json'), case)
+            print(f"Case {case['id']} lost its worker, moved to {target}.")
+
+    def status(self):
+        """
+        Returns the number of cases per state.
+        """
+        return {sub: len(glob.glob(self.path(sub, '*.json' if sub != 'results' else '*.npz')))
+                for sub in ('pending', 'claimed', 'results', 'failed')}
+
+    def results(self):
+        """
+        Returns a dict mapping case id to its result arrays.
+        """
+        found = {}
+        for path in sorted(glob.glob(self.path('results', '*.npz'))):
+            if os.path.basename(path).startswith('.'):
+                continue
+            with np.load(path) as data:
+                found[os.path.basename(path)[:-len('.npz')]] = {key: data[key] for key in data.files}
+        return found
+
+    @staticmethod
+    def write_json(path, data):
+        temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary, 'w') as file:
+            json.dump(data, file)
+        os.replace(temporary, path)
+
+    @staticmethod
+    def read_json(path):
+        with open(path, 'r') as file:
+            return json.load(file)
+
+
+class SweepWorker:
+    def __init__(self, broker, dat_file, sofistik_path, work_dir=None, worker_id=None,
+                 iteration_factory=None, heartbeat_interval=10.0):
+        """
+        Pulls cases from a broker and iterates each on a private copy of the model.
+
+        :param broker: DirectoryBroker shared with the other workers.
+        :param dat_file: Model .dat file (its .cdb is copied too when present).
+        :param sofistik_path: Path to the SOFiSTiK installation.
+        :param work_dir: Directory for the case copies (default: beside the .dat file).
+        :param worker_id: Name of the worker in the broker (default: host name and a random suffix).
+        :param iteration_factory: Callable (V, H, epsilon, cdb_file_path, dat_file) returning an
+                                  Iteration (default: Iteration through the host's SolverQueue).
+        :param heartbeat_interval: Seconds between two heartbeats of the running case.
+        """
+        self.broker = broker
+        self.dat_file = os.path.abspath(os.path.normpath(dat_file))
+        self.sofistik_path = sofistik_path
+        self.work_dir = work_dir or os.path.join(os.path.dirname(self.dat_file), 'sweep_work')
+        self.worker_id = worker_id or f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+        self.iteration_factory = iteration_factory or self.default_iteration
+        self.heartbeat_interval = heartbeat_interval
+        os.makedirs(self.work_dir, exist_ok=True)
+
+    def default_iteration(self, V, H, epsilon, cdb_file_path, dat_file):
+        return Iteration(V, H, epsilon, cdb_file_path, dat_file, self.sofistik_path, solver_queue=SolverQueue())
+
+    def run(self, wait=False, poll_interval=5.0):
+        """
+        Processes cases until the broker has none left (or forever when wait is set).
+
+        :return: Number of cases solved by this worker.
+        """
+        solved = 0
+        while True:
+            case = self.broker.claim(self.worker_id)
+            if case is None:
+                if not wait:
+                    break
+                time.sleep(poll_interval)
+                continue
+            if self.run_case(case):
+                solved += 1
+        print(f"Worker {self.worker_id} finished, {solved} case(s) solved.")
+        return solved
+
+    def run_case(self, case):
+        """
+        Iterates one case while a background thread sends heartbeats.
+
+        :return: True when the result was pushed.
+        """
+        case_id = case['id']
+        print(f"Worker {self.worker_id} starts case {case_id}.")
+        dat_file = os.path.join(self.work_dir, f"{case_id}.dat")
+        cdb_file_path = dat_file.replace('.dat', '.cdb')
+        shutil.copy(self.dat_file, dat_file)
+        if os.path.exists(self.dat_file.replace('.dat', '.cdb')):
+            shutil.copy(self.dat_file.replace('.dat', '.cdb'), cdb_file_path)
+
+        done = threading.Event()
+
+        def beat():
+            while not done.wait(self.heartbeat_interval):
+                self.broker.heartbeat(case_id, self.worker_id)
+
+        heartbeat = threading.Thread(target=beat, daemon=True)
+        heartbeat.start()
+        try:
+            iteration = self.iteration_factory(case['V'], case['H'], case['epsilon'], cdb_file_path, dat_file)
+            iteration.initialize()
+            converged = iteration.loop()
+            if not converged:
+                raise RuntimeError("iteration did not converge")
+            self.broker.complete(case_id, self.worker_id, V=case['V'], H=case['H'],
+                                 nr=iteration.node_index.nr, displacement=iteration.displacement,
+                                 solver_runs=iteration.solver_runs, worker=self.worker_id)
+            return True
+        except Exception as e:
+            self.broker.fail(case_id, self.worker_id, e)
+            return False
+        finally:
+            done.set()
+            heartbeat.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed (V, H) sweeps through a shared broker directory.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    submit = subparsers.add_parser('submit', help="queue the cases of a V x H grid")
+    submit.add_argument('broker')
+    submit.add_argument('--V', type=float, nargs='+', required=True)
+    submit.add_argument('--H', type=float, nargs='+', required=True)
+    submit.add_argument('--epsilon', type=float, required=True)
+
+    worker = subparsers.add_parser('worker', help="solve queued cases on this host")
+    worker.add_argument('broker')
+    worker.add_argument('dat_file')
+    worker.add_argument('sofistik_path')
+    worker.add_argument('--wait', action='store_true', help="keep polling when the queue is empty")
+
+    status = subparsers.add_parser('status', help="count cases per state")
+    status.add_argument('broker')
+
+    args = parser.parse_args()
+    broker = DirectoryBroker(args.broker)
+    if args.command == 'submit':
+        broker.submit((V, H, args.epsilon) for V, H in itertools.product(args.V, args.H))
+    elif args.command == 'worker':
+        SweepWorker(broker, args.dat_file, args.sofistik_path).run(wait=args.wait)
+    else:
+        print(broker.status())
+
+
+if __name__ == "__main__":
+    main()
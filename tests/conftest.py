@@ -0,0 +1,34 @@
+import os
+import sys
+import shutil
+import pytest
+
+# The modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flamb import Iteration
+from cdb_backend import MemoryBackend
+from benchmark import FakeSolver, make_model
+
+
+@pytest.fixture
+def make_iteration(tmp_path):
+    """
+    Returns a function building an Iteration (V = H = 3, epsilon 1e-6) on a fresh copy of the
+    benchmark line model, solved by a FakeSolver writing into a MemoryBackend.
+
+    :param nodes: Number of nodes of the model.
+    :param records: Additional CDB records {(kwh, kwl): records} of the model.
+    :param solver: FakeSolver options.
+    :param name: Name of the .dat file; the same name gives the same model hash.
+    :param iteration_options: Iteration options.
+    """
+    def make(nodes=10, records=None, solver=None, name='case', **iteration_options):
+        template = make_model(str(tmp_path), nodes)
+        dat_file = os.path.join(str(tmp_path), f"{name}.dat")
+        shutil.copy(template[0], dat_file)
+        backend = MemoryBackend({(20, 0): template[1], **(records or {})})
+        return Iteration(3.0, 3.0, 1e-6, dat_file.replace('.dat', '.cdb'), dat_file, str(tmp_path),
+                         cdb_backend=backend, solver=FakeSolver(backend, nodes, **(solver or {})),
+                         **iteration_options)
+    return make
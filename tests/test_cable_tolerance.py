@@ -0,0 +1,11 @@
+import io
+import contextlib
+
+
+def test_cable_tolerance_without_cables(make_iteration):
+    iteration = make_iteration(cable_tolerance=1e-3)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        iteration.initialize()
+        assert iteration.loop()
+    assert "No cable results found" in output.getvalue()
@@ -0,0 +1,92 @@
+import threading
+from cdb_backend import DLLBackend, CDB_NO_KEY, KEY_MISSING, KEY_WITH_DATA
+
+
+class FakeDLL:
+    """
+    Stand-in for the process-wide CDB DLL: sof_cdb_init hands out a new index per CDB and
+    sof_cdb_close(0) closes all of them.
+    """
+
+    def __init__(self):
+        self.open = set()
+        self.next_index = 1
+        self.kexist_calls = 0
+
+    def sof_cdb_init(self, path, init_type):
+        index = self.next_index
+        self.next_index += 1
+        self.open.add(index)
+        return index
+
+    def sof_cdb_status(self, index):
+        return 1 if index in self.open else 0
+
+    def sof_cdb_close(self, index):
+        if index == 0:
+            self.open.clear()
+        else:
+            self.open.discard(index)
+
+    def sof_cdb_get(self, index, kwh, kwl, record, rec_len, pos):
+        return CDB_NO_KEY
+
+    def sof_cdb_kexist(self, kwh, kwl):
+        self.kexist_calls += 1
+        return KEY_WITH_DATA
+
+
+def make_backend(dll):
+    # Skip loading the real DLL
+    backend = DLLBackend.__new__(DLLBackend)
+    backend.myDLL = dll
+    backend.Index = None
+    return backend
+
+
+def test_close_keeps_other_sessions_open():
+    dll = FakeDLL()
+    first, second = make_backend(dll), make_backend(dll)
+    first.open('first.cdb')
+    second.open('second.cdb')
+    assert first.Index.value != second.Index.value
+
+    first.close()
+    assert first.status() == 0
+    assert second.status() == 1
+    second.close()
+    assert dll.open == set()
+
+
+def test_key_exists_scans_own_session_when_several_are_open():
+    dll = FakeDLL()
+    first, second = make_backend(dll), make_backend(dll)
+    first.open('first.cdb')
+    assert first.key_exists(24, 2) == KEY_WITH_DATA
+    second.open('second.cdb')
+    # sof_cdb_kexist cannot tell the sessions apart
+    assert first.key_exists(24, 2) == KEY_MISSING
+    assert dll.kexist_calls == 1
+    first.close()
+    second.close()
+
+
+def test_sessions_of_several_threads():
+    dll = FakeDLL()
+    errors = []
+
+    def session():
+        backend = make_backend(dll)
+        for _ in range(200):
+            backend.open('case.cdb')
+            if backend.status() != 1:
+                errors.append(backend.Index.value)
+            backend.close()
+
+    threads = [threading.Thread(target=session) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert dll.open == set()
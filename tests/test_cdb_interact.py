@@ -0,0 +1,67 @@
+from ctypes import sizeof
+import numpy as np
+from flamb import CDBinteract
+from cdb_backend import MemoryBackend
+from sofistik_daten import CN_DISP, CN_DISPC, CLC_CTRL
+
+
+class CountingBackend(MemoryBackend):
+    """
+    MemoryBackend counting the records read per key.
+    """
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.reads = {}
+
+    def get(self, kwh, kwl, record, rec_len, pos=1):
+        self.reads[(kwh, kwl)] = self.reads.get((kwh, kwl), 0) + 1
+        return super().get(kwh, kwl, record, rec_len, pos)
+
+
+def displacement_backend(nodes):
+    # Key 24/LC starts with the CN_DISPC maximum records (same size as CN_DISP)
+    records = {}
+    for lc in (2, 3):
+        maxima = [CN_DISPC(m_id=0, m_ux=9.0), CN_DISPC(m_id=1, m_ux=-9.0)]
+        records[(24, lc)] = maxima + [CN_DISP(m_nr=i, m_ux=0.1 * i * (lc - 1)) for i in range(1, nodes + 1)]
+        records[(12, lc)] = [CLC_CTRL(m_kind=1, m_fact=1.0)]
+    return CountingBackend(records)
+
+
+def test_get_u_buffer_holds_maximum_records(capsys):
+    backend = displacement_backend(5)
+    cdb = CDBinteract(backend)
+    cdb.open_cdb('model.cdb')
+    metadata = cdb.read_metadata((2, 3), nodes=5)
+    cdb.close_cdb()
+    assert metadata['displacement_records'] == {2: 7, 3: 7}
+
+    cdb = CDBinteract(backend, metadata)
+    cdb.open_cdb('model.cdb')
+    backend.reads = {}
+    buffers = []
+    read_into = cdb.read_into
+    cdb.read_into = lambda *args: buffers.append(args[-1]) or read_into(*args)
+    nr, ux, uy, uz = cdb.get_u()
+    cdb.close_cdb()
+
+    assert buffers == [7, 7]
+    # One read per record and one for the end of each key, no scan of the lengths
+    assert backend.reads == {(24, 2): 8, (24, 3): 8}
+    # The maximum records are not returned as nodes
+    assert nr.tolist() == [1, 2, 3, 4, 5]
+    assert np.allclose(ux, 0.3 * np.arange(1, 6))
+    assert "Max displacement: 1.5" in capsys.readouterr().out
+
+
+def test_read_into_exact_and_grown_buffers():
+    backend = displacement_backend(5)
+    cdb = CDBinteract(backend)
+    cdb.open_cdb('model.cdb')
+    for count in (7, 1, 3):
+        data = cdb.read_into(24, 2, CN_DISP, count)
+        assert data['m_nr'][2:].tolist() == [1, 2, 3, 4, 5]
+    exact = cdb.read_into(24, 2, CN_DISP, 7)
+    assert sizeof(exact.base) == 7 * exact.dtype.itemsize
+    cdb.close_cdb()
@@ -0,0 +1,125 @@
+import sys
+import time
+import threading
+import numpy as np
+from job_queue import SolverQueue, RUNNING, DONE, CANCELLED, FAILED
+
+
+def sleeper(seconds):
+    return [sys.executable, '-c', f"import time; time.sleep({seconds})"]
+
+
+def make_queue(tmp_path, max_concurrency, lease_timeout=30.0):
+    return SolverQueue(str(tmp_path / 'queue.sqlite'), max_concurrency=max_concurrency, poll_interval=0.05,
+                       lease_timeout=lease_timeout)
+
+
+def run_in_thread(queue, job_id):
+    thread = threading.Thread(target=queue.run, args=(job_id,))
+    thread.start()
+    return thread
+
+
+def wait_for(queue, job_id, state, timeout=10.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        if queue.status(job_id)['state'] == state:
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_concurrency_limit(tmp_path):
+    queue = make_queue(tmp_path, 2)
+    # Every job logs the start and end of its process
+    log = str(tmp_path / 'log.txt')
+    script = (f"import time; log = open({log!r}, 'a'); log.write(f's {{time.time()}}\\n'); log.flush(); "
+              f"time.sleep(0.4); log.write(f'e {{time.time()}}\\n')")
+    jobs = [queue.submit([sys.executable, '-c', script]) for _ in range(5)]
+    threads = [run_in_thread(queue, job_id) for job_id in jobs]
+    for thread in threads:
+        thread.join()
+
+    assert all(queue.status(job_id)['state'] == DONE for job_id in jobs)
+    with open(log) as file:
+        events = sorted((float(line.split()[1]), 1 if line[0] == 's' else -1) for line in file)
+    assert len(events) == 10
+    running = np.cumsum([change for _, change in events])
+    assert running.max() == 2
+
+
+def test_priority_order(tmp_path):
+    queue = make_queue(tmp_path, 1)
+    blocker = queue.submit(sleeper(0.5))
+    threads = [run_in_thread(queue, blocker)]
+    assert wait_for(queue, blocker, RUNNING)
+    low = queue.submit(sleeper(0.1), priority=0)
+    high = queue.submit(sleeper(0.1), priority=5)
+    threads += [run_in_thread(queue, low), run_in_thread(queue, high)]
+    for thread in threads:
+        thread.join()
+
+    assert queue.status(high)['started'] < queue.status(low)['started']
+
+
+def test_cancel_queued_and_running(tmp_path):
+    queue = make_queue(tmp_path, 1)
+    running = queue.submit(sleeper(30))
+    thread = run_in_thread(queue, running)
+    assert wait_for(queue, running, RUNNING)
+
+    queued = queue.submit(sleeper(0.1))
+    assert queue.cancel(queued)
+    assert queue.run(queued) is None
+
+    start = time.time()
+    assert queue.cancel(running)
+    thread.join(10)
+    assert not thread.is_alive() and time.time() - start < 10
+    assert queue.status(running)['state'] == CANCELLED
+    assert not queue.cancel(running)
+
+
+def test_abandoned_jobs_expire(tmp_path):
+    queue = make_queue(tmp_path, 1, lease_timeout=0.5)
+    # Submitter gone before its job started, and a running job whose process died
+    abandoned = queue.submit(sleeper(0.1), priority=10)
+    dead = queue.submit(sleeper(0.1))
+    with queue.connect() as conn:
+        conn.execute("UPDATE jobs SET state = ?, heartbeat = ? WHERE id = ?", (RUNNING, time.time(), dead))
+    time.sleep(0.6)
+
+    start = time.time()
+    result = queue.execute(sleeper(0.1))
+    assert result is not None and result.returncode == 0
+    assert time.time() - start < 5
+    assert queue.status(abandoned)['state'] == CANCELLED
+    assert queue.status(dead)['state'] == FAILED
+
+
+def test_interrupted_wait_leaves_the_queue(tmp_path, monkeypatch):
+    queue = make_queue(tmp_path, 1)
+    blocker = queue.submit(sleeper(0.5))
+    thread = run_in_thread(queue, blocker)
+    assert wait_for(queue, blocker, RUNNING)
+
+    # Ctrl-C in the poll loop of the waiting job (the running one only joins its reader)
+    def interrupt(seconds):
+        raise KeyboardInterrupt
+
+    waiting = queue.submit(sleeper(0.1))
+    with monkeypatch.context() as patch:
+        patch.setattr(time, 'sleep', interrupt)
+        try:
+            queue.run(waiting)
+        except KeyboardInterrupt:
+            pass
+    thread.join()
+    assert queue.status(waiting)['state'] == CANCELLED
+
+
+def test_queue_file_in_new_directory(tmp_path):
+    # Shared path from config.ini, e.g. a directory under ProgramData not created yet
+    queue = SolverQueue(str(tmp_path / 'shared' / 'queue.sqlite'), max_concurrency=3)
+    assert queue.max_concurrency() == 3
+    assert SolverQueue(queue.db_path).max_concurrency() == 3
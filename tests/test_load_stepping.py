@@ -0,0 +1,41 @@
+import io
+import contextlib
+import numpy as np
+from solution_store import SolutionStore
+
+
+def iterate(make_iteration, load_stepping, solver, nodes=10, **iteration_options):
+    iteration = make_iteration(nodes, solver=solver, name=f"case_{load_stepping}", load_stepping=load_stepping,
+                               **iteration_options)
+    # Passes allowed under the full load, by the plain loop as well
+    iteration.max_final_iterations = 200
+    with contextlib.redirect_stdout(io.StringIO()):
+        iteration.initialize()
+        converged = iteration.loop()
+    return converged, iteration
+
+
+def test_load_stepping_converges_where_loop_does_not(make_iteration):
+    # From the undeformed geometry the full load oscillates without end, from the geometry of the
+    # previous load step it converges
+    solver = {'flexibility': 0.6, 'coupling': 1.0}
+    converged, iteration = iterate(make_iteration, False, solver)
+    assert not converged
+    assert iteration.solver.runs == 201
+    converged, iteration = iterate(make_iteration, True, solver)
+    assert converged
+    assert iteration.solver.runs < 200
+
+
+def test_diverging_run_is_not_converged(make_iteration, tmp_path):
+    # P-delta model amplifying the sway by 2.4 per pass under the full load: the displacements overflow
+    solver = {'flexibility': 0.1, 'coupling': 8.0, 'model': 'sway'}
+    store = SolutionStore(str(tmp_path / 'store'))
+    for load_stepping in (False, True):
+        converged, iteration = iterate(make_iteration, load_stepping, solver, solution_store=store)
+        assert not converged
+        assert np.all(np.isfinite(iteration.nodes.xyz))
+        with open(iteration.dat_file) as file:
+            content = file.read()
+        assert 'inf' not in content and 'nan' not in content
+        assert store.solutions(iteration.model_hash) == []
@@ -0,0 +1,30 @@
+import io
+import os
+import contextlib
+from flamb import ElementProperties, ConnectivityGraph, model_file_path
+from benchmark import beam_records
+
+
+def initialize(make_iteration, records):
+    iteration = make_iteration(records=records, relaxation=True, connectivity=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        iteration.initialize()
+    return iteration
+
+
+def test_model_data_saved_beside_the_cdb(make_iteration):
+    first = initialize(make_iteration, beam_records(10, 0.1))
+    cdb_file_path = first.cdb_file_path
+    assert os.path.isfile(model_file_path(cdb_file_path, 'properties'))
+    assert os.path.isfile(model_file_path(cdb_file_path, 'graph'))
+
+    # Same model: both are loaded from the files, not read from the (now empty) CDB
+    second = initialize(make_iteration, {})
+    assert second.properties.beam_nr.tolist() == first.properties.beam_nr.tolist()
+    assert second.graph.indices.tolist() == first.graph.indices.tolist()
+    assert len(second.graph.indices) == 2 * 9
+
+    assert ElementProperties.load(cdb_file_path, 'other model') is None
+    assert ConnectivityGraph.load(cdb_file_path, 'other model') is None
+    missing = os.path.join(os.path.dirname(cdb_file_path), 'missing.cdb')
+    assert ConnectivityGraph.load(missing, second.model_hash) is None
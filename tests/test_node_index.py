@@ -0,0 +1,17 @@
+import numpy as np
+from flamb import NodeIndex
+
+
+def test_empty_index():
+    index = NodeIndex(np.zeros(0, dtype=np.int64))
+    assert len(index) == 0
+    assert index.positions([1, 2]).tolist() == [-1, -1]
+    assert index.scatter_add([1], [1.0]).tolist() == []
+    assert len(NodeIndex([0, 0])) == 0
+
+
+def test_duplicates_keep_last_row():
+    index = NodeIndex([3, 1, 3, 2])
+    assert index.nr.tolist() == [1, 2, 3]
+    assert index.rows.tolist() == [1, 3, 2]
+    assert index.scatter_add([3, 3, 5], [1.0, 2.0, 4.0]).tolist() == [0.0, 0.0, 3.0]
@@ -0,0 +1,18 @@
+import io
+import contextlib
+from flamb import NodeIndex, ElementProperties
+
+
+def test_relaxation_without_beams(make_iteration):
+    # No CBEAM and no CSECT records in the CDB
+    iteration = make_iteration(relaxation=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        iteration.initialize()
+        flexibility = iteration.properties.node_flexibility(iteration.node_index)
+        assert flexibility.tolist() == [1.0] * len(iteration.node_index)
+        assert iteration.loop()
+
+    beams = {'m_nr': [], 'm_node': [], 'm_np': [], 'm_dl': []}
+    sections = {'m_a': [], 'm_iy': [], 'm_iz': [], 'm_em': []}
+    properties = ElementProperties(beams, sections, [])
+    assert properties.node_flexibility(NodeIndex([1, 2, 3])).tolist() == [1.0, 1.0, 1.0]
@@ -0,0 +1,29 @@
+import numpy as np
+from spatial_index import NodeGrid
+
+
+def test_coincident_nodes():
+    grid = NodeGrid(np.arange(1, 5), np.zeros((4, 3)))
+    assert len(grid.cells) == 1
+    assert grid.box([0, 0, 0], [0, 0, 0]).tolist() == [1, 2, 3, 4]
+    assert grid.nearest([1.0, 0, 0]) == (1, 1.0)
+
+    # Spreading them out rebuilds the grid
+    assert grid.update(np.column_stack([np.arange(4.0), np.zeros(4), np.zeros(4)])) == 4
+    assert grid.rebuilds == 1
+    assert grid.nearest([2.2, 0, 0])[0] == 3
+
+
+def test_box_and_nearest_match_brute_force():
+    rng = np.random.default_rng(0)
+    xyz = rng.uniform(0, 10, (500, 3))
+    xyz[:, 2] = 0.0
+    nr = np.arange(1, 501) * 3
+    grid = NodeGrid(nr, xyz)
+    for point in rng.uniform(-2, 12, (20, 3)):
+        distance = np.linalg.norm(xyz - point, axis=1)
+        found, found_distance = grid.nearest(point)
+        assert found == nr[np.argmin(distance)] and np.isclose(found_distance, distance.min())
+        lower, upper = point - 1.5, point + 1.5
+        inside = np.all((xyz >= lower) & (xyz <= upper), axis=1)
+        assert grid.box(lower, upper).tolist() == nr[inside].tolist()
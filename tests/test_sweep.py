@@ -0,0 +1,136 @@
+import io
+import os
+import time
+import threading
+import contextlib
+from flamb import Iteration
+from cdb_backend import MemoryBackend
+from benchmark import FakeSolver, make_model
+from sweep import DirectoryBroker, SweepWorker
+
+
+def make_broker(tmp_path, **options):
+    return DirectoryBroker(str(tmp_path / 'broker'), **options)
+
+
+def age(broker, seconds):
+    # Claimed cases whose last heartbeat is seconds old
+    for name in os.listdir(os.path.join(broker.root, 'claimed')):
+        path = os.path.join(broker.root, 'claimed', name)
+        then = time.time() - seconds
+        os.utime(path, (then, then))
+
+
+def test_case_claimed_by_one_worker(tmp_path):
+    broker = make_broker(tmp_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        broker.submit((V, 1.0, 1e-4) for V in range(40))
+    claimed = []
+
+    def work(worker_id):
+        # Each worker has its own broker object, as on separate hosts
+        own = make_broker(tmp_path)
+        while True:
+            case = own.claim(worker_id)
+            if case is None:
+                break
+            claimed.append(case['id'])
+
+    threads = [threading.Thread(target=work, args=(f"worker{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(claimed) == 40
+    assert len(set(claimed)) == 40
+    assert broker.status() == {'pending': 0, 'claimed': 40, 'results': 0, 'failed': 0}
+
+
+def test_stale_case_requeued(tmp_path):
+    broker = make_broker(tmp_path, heartbeat_timeout=60.0)
+    with contextlib.redirect_stdout(io.StringIO()):
+        broker.submit([(1.0, 1.0, 1e-4)])
+        case = broker.claim('lost')
+        assert broker.claim('other') is None
+
+        # Heartbeats keep the case with its worker
+        age(broker, 50.0)
+        broker.heartbeat(case['id'], 'lost')
+        age(broker, 30.0)
+        assert broker.claim('other') is None
+
+        age(broker, 61.0)
+        again = broker.claim('other')
+    assert again['id'] == case['id']
+    assert again['attempts'] == 1
+
+    # The lost worker comes back: its result is stored, the other worker keeps its claim
+    broker.complete(case['id'], 'lost', displacement=[1.0])
+    assert broker.status() == {'pending': 0, 'claimed': 1, 'results': 1, 'failed': 0}
+
+
+def test_retries_then_failed(tmp_path):
+    broker = make_broker(tmp_path, max_attempts=3)
+    with contextlib.redirect_stdout(io.StringIO()):
+        broker.submit([(1.0, 1.0, 1e-4)])
+        for attempt in range(1, 4):
+            case = broker.claim('worker')
+            assert case['attempts'] == attempt - 1
+            broker.fail(case['id'], 'worker', f"error {attempt}")
+        assert broker.claim('worker') is None
+    assert broker.status() == {'pending': 0, 'claimed': 0, 'results': 0, 'failed': 1}
+    failed = broker.read_json(broker.path('failed', case['id'] + '.json'))
+    assert failed['attempts'] == 3 and failed['error'] == "error 3"
+
+
+def test_duplicates_dropped(tmp_path):
+    broker = make_broker(tmp_path, heartbeat_timeout=60.0)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        assert len(broker.submit([(1.0, 1.0, 1e-4), (2.0, 1.0, 1e-4)])) == 2
+        # Queued, claimed or solved cases are not queued again
+        assert broker.submit([(1.0, 1.0, 1e-4), (2.0, 1.0, 1e-4)]) == []
+        first = broker.claim('first')
+        assert broker.submit([(first['V'], first['H'], first['epsilon'])]) == []
+
+        age(broker, 61.0)
+        second = broker.claim('second')
+        assert second['id'] == first['id']
+        broker.complete(first['id'], 'second', worker='second')
+        broker.complete(first['id'], 'first', worker='first')
+        assert broker.submit([(first['V'], first['H'], first['epsilon'])]) == []
+    assert "Duplicate result" in output.getvalue()
+    assert str(broker.results()[first['id']]['worker']) == 'second'
+    assert broker.status() == {'pending': 1, 'claimed': 0, 'results': 1, 'failed': 0}
+
+
+def make_worker(tmp_path, broker, **solver_options):
+    template = make_model(str(tmp_path), 10)
+
+    def iteration(V, H, epsilon, cdb_file_path, dat_file):
+        backend = MemoryBackend({(20, 0): template[1]})
+        return Iteration(V, H, epsilon, cdb_file_path, dat_file, str(tmp_path), cdb_backend=backend,
+                         solver=FakeSolver(backend, 10, **solver_options))
+
+    return SweepWorker(broker, template[0], str(tmp_path), worker_id='worker', iteration_factory=iteration)
+
+
+def test_worker_solves_cases(tmp_path):
+    broker = make_broker(tmp_path)
+    with contextlib.redirect_stdout(io.StringIO()):
+        broker.submit([(1.0, 1.0, 1e-6), (3.0, 2.0, 1e-6)])
+        assert make_worker(tmp_path, broker).run() == 2
+    results = broker.results()
+    assert sorted(results) == [broker.case_id(1.0, 1.0, 1e-6), broker.case_id(3.0, 2.0, 1e-6)]
+    assert all(result['displacement'].shape == (10, 3) for result in results.values())
+
+
+def test_diverging_case_fails(tmp_path):
+    broker = make_broker(tmp_path, max_attempts=1)
+    # P-delta amplifying the sway under the full load: the displacements overflow
+    with contextlib.redirect_stdout(io.StringIO()):
+        broker.submit([(3.0, 3.0, 1e-6)])
+        assert make_worker(tmp_path, broker, flexibility=0.1, coupling=8.0, model='sway').run() == 0
+    assert broker.status() == {'pending': 0, 'claimed': 0, 'results': 0, 'failed': 1}
+    failed = broker.read_json(broker.path('failed', broker.case_id(3.0, 3.0, 1e-6) + '.json'))
+    assert failed['error'] == "iteration did not converge"